@@ -1,12 +1,23 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
-import io
-import os
+from datetime import datetime, timedelta
 from pathlib import Path
+import functools
+import zipfile
+
+from pilotage_data import (
+    DEPARTEMENTS, FREQUENCES, NATURES, DOMAINES, STATUTS, PORTEURS, PRIORITES,
+    IMPORT_COLUMNS, REGISTRE_COLUMNS, MES_DEMANDES_COLUMNS,
+    bootstrap, is_ready, load_data, count_projets, search_projets, find_similar_projets, get_dashboard_counts, export_projets,
+    get_timeline, count_timeline, get_kpi_trends, get_projet, get_projet_events,
+    add_projet, import_projets, validate_projet_admin, validate_projets_admin_bulk,
+    update_statut_projets, delete_projet,
+    get_user_notifications, count_unread_notifications, mark_notifications_read,
+    get_user_demandes, get_user_demandes_stats,
+    PROFILING, start_profile, profile_running, finish_profile, section, timed,
+)
 
 # ═════════════════════════════════════════════════════════════════════
 # CONFIGURATION DE LA PAGE
@@ -21,236 +32,22 @@ st.set_page_config(
 # ═════════════════════════════════════════════════════════════════════
 # BASE DE DONNÉES
 # ═════════════════════════════════════════════════════════════════════
+# Accès aux données dans pilotage_data (sans dépendance à Streamlit)
 SCRIPT_DIR = Path(__file__).parent
-DB_PATH = SCRIPT_DIR / "projets_bi.db"
-
-@st.cache_resource
-def get_connection():
-    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
-    return conn
-
-def init_db():
-    conn = get_connection()
-    c = conn.cursor()
-    
-    # Table principale des projets avec nouveaux champs
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS projets (
-            id                INTEGER PRIMARY KEY AUTOINCREMENT,
-            departement       TEXT,
-            libelle           TEXT,
-            description       TEXT,
-            frequence         TEXT,
-            date_entree       TEXT,
-            date_fin          TEXT,
-            date_debut        TEXT    DEFAULT '',
-            nature            TEXT,
-            domaine           TEXT,
-            statut            TEXT    DEFAULT 'NON COMMENCE',
-            porteur           TEXT    DEFAULT 'NON ASSIGNE',
-            priorite          TEXT    DEFAULT 'A DEFINIR',
-            date_livraison    TEXT    DEFAULT '',
-            admin_filled      INTEGER DEFAULT 0,
-            validation_status TEXT    DEFAULT 'EN ATTENTE',
-            validation_date   TEXT    DEFAULT '',
-            email_demandeur   TEXT    DEFAULT '',
-            commentaire_admin TEXT    DEFAULT '',
-            historique        TEXT    DEFAULT '',
-            created_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Table des utilisateurs (demandeurs)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            email       TEXT UNIQUE,
-            nom         TEXT,
-            departement TEXT,
-            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Table des notifications
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS notifications (
-            id         INTEGER PRIMARY KEY AUTOINCREMENT,
-            projet_id  INTEGER,
-            user_email TEXT,
-            message    TEXT,
-            statut     TEXT DEFAULT 'NON LU',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (projet_id) REFERENCES projets(id)
-        )
-    """)
-    
-    conn.commit()
-
-init_db()
-
-# ═════════════════════════════════════════════════════════════════════
-# FONCTIONS DE BASE DE DONNÉES
-# ═════════════════════════════════════════════════════════════════════
-
-def load_data() -> pd.DataFrame:
-    conn = get_connection()
-    df = pd.read_sql_query("SELECT * FROM projets ORDER BY id DESC", conn)
-    return df
-
-def add_projet(departement, libelle, description, frequence, date_fin, nature, domaine, email_demandeur):
-    conn = get_connection()
-    c = conn.cursor()
-    historique = f"[{datetime.now().strftime('%Y-%m-%d %H:%M')}] Demande créée par {email_demandeur}"
-    c.execute("""
-        INSERT INTO projets
-        (departement, libelle, description, frequence, date_entree, date_fin,
-         nature, domaine, email_demandeur, historique, validation_status)
-        VALUES (?,?,?,?,?,?,?,?,?,?,'EN ATTENTE')
-    """, (departement, libelle, description, frequence,
-          datetime.today().strftime("%Y-%m-%d"),
-          date_fin.strftime("%Y-%m-%d"), nature, domaine, email_demandeur, historique))
-    
-    projet_id = c.lastrowid
-    
-    # Créer une notification
-    add_notification(projet_id, email_demandeur, 
-                    f"Votre demande '{libelle}' a été créée avec succès et est en attente de validation.")
-    
-    conn.commit()
-    return projet_id
-
-def update_projet_user(id_sel, libelle, description, frequence, nature, domaine):
-    conn = get_connection()
-    c = conn.cursor()
-    
-    # Récupérer l'historique existant
-    row = c.execute("SELECT historique FROM projets WHERE id=?", (id_sel,)).fetchone()
-    historique = row[0] if row else ""
-    historique += f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M')}] Demande modifiée par l'utilisateur"
-    
-    c.execute("""
-        UPDATE projets SET
-            libelle=?, description=?, frequence=?, nature=?, domaine=?,
-            historique=?, updated_at=CURRENT_TIMESTAMP
-        WHERE id=?
-    """, (libelle, description, frequence, nature, domaine, historique, id_sel))
-    conn.commit()
-
-def validate_projet_admin(id_sel, libelle, description, frequence, nature, domaine,
-                         statut, porteur, priorite, date_livraison, commentaire_admin, date_debut=""):
-    conn = get_connection()
-    c = conn.cursor()
-    
-    # Récupérer l'email du demandeur et l'historique
-    row = c.execute("SELECT email_demandeur, historique FROM projets WHERE id=?", (id_sel,)).fetchone()
-    email_demandeur = row[0] if row else ""
-    historique = row[1] if row else ""
-    historique += f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M')}] Demande VALIDÉE par l'administrateur"
-    historique += f"\n   → Porteur: {porteur}, Priorité: {priorite}, Statut: {statut}"
-    if date_debut:
-        historique += f"\n   → Date de début: {date_debut}"
-    
-    c.execute("""
-        UPDATE projets SET
-            libelle=?, description=?, frequence=?, nature=?, domaine=?,
-            statut=?, porteur=?, priorite=?, date_livraison=?, date_debut=?,
-            admin_filled=1, validation_status='VALIDEE', validation_date=?,
-            commentaire_admin=?, historique=?, updated_at=CURRENT_TIMESTAMP
-        WHERE id=?
-    """, (libelle, description, frequence, nature, domaine,
-          statut, porteur, priorite, date_livraison, date_debut,
-          datetime.now().strftime("%Y-%m-%d %H:%M"),
-          commentaire_admin, historique, id_sel))
-    
-    # Créer une notification pour le demandeur
-    add_notification(id_sel, email_demandeur,
-                    f"Votre demande '{libelle}' a été VALIDÉE. Porteur assigné: {porteur}. Priorité: {priorite}.")
-    
-    conn.commit()
-
-def update_statut_projet(id_sel, nouveau_statut, commentaire=""):
-    conn = get_connection()
-    c = conn.cursor()
-    
-    # Récupérer l'email du demandeur et l'historique
-    row = c.execute("SELECT email_demandeur, historique, libelle FROM projets WHERE id=?", (id_sel,)).fetchone()
-    email_demandeur = row[0] if row else ""
-    historique = row[1] if row else ""
-    libelle = row[2] if row else ""
-    
-    historique += f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M')}] Statut changé vers: {nouveau_statut}"
-    if commentaire:
-        historique += f"\n   → Commentaire: {commentaire}"
-    
-    c.execute("""
-        UPDATE projets SET
-            statut=?, historique=?, updated_at=CURRENT_TIMESTAMP
-        WHERE id=?
-    """, (nouveau_statut, historique, id_sel))
-    
-    # Créer une notification
-    add_notification(id_sel, email_demandeur,
-                    f"Statut de votre demande '{libelle}' mis à jour: {nouveau_statut}")
-    
-    conn.commit()
-
-def delete_projet(id_sel):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM projets WHERE id=?", (id_sel,))
-    c.execute("DELETE FROM notifications WHERE projet_id=?", (id_sel,))
-    conn.commit()
-
-def add_notification(projet_id, user_email, message):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("""
-        INSERT INTO notifications (projet_id, user_email, message, statut)
-        VALUES (?, ?, ?, 'NON LU')
-    """, (projet_id, user_email, message))
-    conn.commit()
-
-def get_user_notifications(email):
-    conn = get_connection()
-    df = pd.read_sql_query("""
-        SELECT n.*, p.libelle as projet_libelle
-        FROM notifications n
-        LEFT JOIN projets p ON n.projet_id = p.id
-        WHERE n.user_email = ?
-        ORDER BY n.created_at DESC
-    """, conn, params=(email,))
-    return df
-
-def mark_notifications_read(email):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("UPDATE notifications SET statut='LU' WHERE user_email=?", (email,))
-    conn.commit()
+if PROFILING:
+    start_profile()
 
-def get_user_demandes(email):
-    conn = get_connection()
-    df = pd.read_sql_query("""
-        SELECT * FROM projets 
-        WHERE email_demandeur = ?
-        ORDER BY created_at DESC
-    """, conn, params=(email,))
-    return df
+# Schéma et caches préparés une fois par processus (premier rerun servi)
+if not is_ready():
+    with st.spinner("Initialisation de l'application..."):
+        bootstrap()
 
 # ═════════════════════════════════════════════════════════════════════
 # CONSTANTES
 # ═════════════════════════════════════════════════════════════════════
-DEPARTEMENTS   = ["OPERATIONS", "PMO", "MARKETING", "MARCHAND",
-                  "DISTRIBUTION", "CONFORMITE", "RISQUES", "DG", "DGA", "SM MARKETING", "BI", "CORPORATE", "IT", "EXTERNE"]
-FREQUENCES     = ["ADHOC", "JOURNALIERE", "HEBDOMADAIRE", "MENSUEL", "2 FOIS PAR SEMAINE", "2 FOIS PAR MOIS"]
-NATURES        = ["EXTRACTION", "ANALYSE", "REPORTING", "DASHBOARD", "AUTRES"]
-DOMAINES       = ["DISTRIBUTION", "MARCHAND", "CLIENT FINAL",
-                  "PARTENAIRES", "INTERNE", "AUTRES"]
-STATUTS        = ["NON COMMENCE", "EN COURS", "TERMINE"]
-PORTEURS       = ["NON ASSIGNE", "CHRISTOL", "JINOR", "CYRILLE",
-                  "DILANE", "SONIA"]
-PRIORITES      = ["A DEFINIR", "DEPRIORISE", "P0", "P1", "P2", "P3", "P4"]
 ADMIN_PASSWORD = "OMCMBI"
+NOTIFICATIONS_PAGE_SIZE = 20
+NOTIFICATIONS_REFRESH = "30s"   # rafraîchissement du badge « non lues »
 
 STATUT_COLORS  = {
     "NON COMMENCE": "#ef4444",
@@ -264,483 +61,53 @@ VALIDATION_COLORS = {
     "REJETEE": "#ef4444",
 }
 
-# ═════════════════════════════════════════════════════════════════════
-# CSS GLOBAL AMÉLIORÉ - DATA PRO MAX STYLE
-# ═════════════════════════════════════════════════════════════════════
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700;800;900&family=Inter:wght@300;400;500;600;700;800&display=swap');
-
-:root {
-    --primary: #6366f1;
-    --primary-dark: #4f46e5;
-    --primary-light: #818cf8;
-    --success: #10b981;
-    --warning: #f59e0b;
-    --danger: #ef4444;
-    --info: #3b82f6;
-    --dark: #1e293b;
-    --light: #f8fafc;
-}
-
-html, body, [class*="css"] { 
-    font-family: 'Inter', 'Poppins', sans-serif; 
-}
-
-/* HEADER MODERNE */
-.main-header {
-    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-    padding: 2.5rem 2rem;
-    border-radius: 20px;
-    margin-bottom: 2rem;
-    box-shadow: 0 20px 60px rgba(102, 126, 234, 0.3);
-    animation: fadeInDown 0.6s ease-out;
-}
-
-.main-header h1 {
-    color: white;
-    font-size: 3rem;
-    font-weight: 900;
-    margin: 0;
-    text-shadow: 2px 2px 4px rgba(0,0,0,0.2);
-    letter-spacing: -1px;
-}
-
-.main-header p {
-    color: rgba(255,255,255,0.9);
-    font-size: 1.1rem;
-    margin-top: 0.5rem;
-}
-
-/* ANIMATIONS */
-@keyframes fadeInDown {
-    from {
-        opacity: 0;
-        transform: translateY(-30px);
-    }
-    to {
-        opacity: 1;
-        transform: translateY(0);
-    }
-}
-
-@keyframes fadeInUp {
-    from {
-        opacity: 0;
-        transform: translateY(30px);
-    }
-    to {
-        opacity: 1;
-        transform: translateY(0);
-    }
-}
-
-@keyframes slideInRight {
-    from {
-        opacity: 0;
-        transform: translateX(30px);
-    }
-    to {
-        opacity: 1;
-        transform: translateX(0);
-    }
-}
-
-@keyframes pulse {
-    0%, 100% { opacity: 1; }
-    50% { opacity: 0.8; }
-}
-
-@keyframes bounce {
-    0%, 100% { transform: translateY(0); }
-    50% { transform: translateY(-10px); }
-}
-
-/* CARTES KPI ULTRA-MODERNES */
-.kpi-card {
-    background: linear-gradient(135deg, #ffffff 0%, #f8fafc 100%);
-    border-radius: 20px;
-    padding: 2rem;
-    box-shadow: 0 10px 30px rgba(0,0,0,.08);
-    border: 1px solid rgba(99, 102, 241, 0.1);
-    position: relative;
-    overflow: hidden;
-    transition: all .4s cubic-bezier(0.4, 0, 0.2, 1);
-    animation: fadeInUp 0.6s ease-out;
-}
-
-.kpi-card::before {
-    content: '';
-    position: absolute;
-    top: 0;
-    left: 0;
-    width: 100%;
-    height: 4px;
-    background: linear-gradient(90deg, var(--primary) 0%, var(--primary-light) 100%);
-    transform: scaleX(0);
-    transform-origin: left;
-    transition: transform 0.4s ease;
-}
-
-.kpi-card:hover::before {
-    transform: scaleX(1);
-}
-
-.kpi-card:hover { 
-    transform: translateY(-10px) scale(1.02); 
-    box-shadow: 0 20px 50px rgba(99, 102, 241, 0.2);
-    border-color: var(--primary);
-}
-
-.kpi-icon {
-    font-size: 2.5rem;
-    position: absolute;
-    right: 1.5rem;
-    top: 1.5rem;
-    opacity: 0.15;
-    transition: all 0.4s ease;
-}
-
-.kpi-card:hover .kpi-icon {
-    opacity: 0.3;
-    transform: scale(1.2) rotate(10deg);
-}
-
-.kpi-title { 
-    font-size: 0.85rem; 
-    font-weight: 700; 
-    color: #64748b; 
-    text-transform: uppercase; 
-    letter-spacing: 0.1em; 
-    margin-bottom: 0.8rem;
-}
-
-.kpi-value { 
-    font-size: 3rem; 
-    font-weight: 900; 
-    background: linear-gradient(135deg, var(--primary) 0%, var(--primary-dark) 100%);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    background-clip: text;
-    margin: 0.5rem 0; 
-    line-height: 1;
-    animation: pulse 2s ease-in-out infinite;
-}
-
-.kpi-sub { 
-    font-size: 0.9rem; 
-    color: #94a3b8; 
-    font-weight: 500;
-    margin-top: 0.8rem;
-}
-
-/* BADGES STATUT MODERNES */
-.badge {
-    display: inline-flex;
-    align-items: center;
-    gap: 0.4rem;
-    padding: 8px 16px; 
-    border-radius: 100px;
-    font-size: 0.75rem; 
-    font-weight: 700; 
-    letter-spacing: 0.05em;
-    text-transform: uppercase;
-    box-shadow: 0 4px 12px rgba(0,0,0,.1);
-    transition: all 0.3s ease;
-    animation: slideInRight 0.5s ease-out;
-}
-
-.badge:hover {
-    transform: translateY(-2px);
-    box-shadow: 0 6px 20px rgba(0,0,0,.15);
-}
-
-.badge::before {
-    content: '';
-    width: 8px;
-    height: 8px;
-    border-radius: 50%;
-    background: currentColor;
-    animation: pulse 2s ease-in-out infinite;
-}
-
-.badge-green  { background: linear-gradient(135deg, #d1fae5 0%, #a7f3d0 100%); color: #065f46; }
-.badge-yellow { background: linear-gradient(135deg, #fef3c7 0%, #fde68a 100%); color: #92400e; }
-.badge-red    { background: linear-gradient(135deg, #fee2e2 0%, #fecaca 100%); color: #991b1b; }
-.badge-blue   { background: linear-gradient(135deg, #dbeafe 0%, #bfdbfe 100%); color: #1e40af; }
-.badge-gray   { background: linear-gradient(135deg, #f3f4f6 0%, #e5e7eb 100%); color: #374151; }
-.badge-orange { background: linear-gradient(135deg, #ffedd5 0%, #fed7aa 100%); color: #9a3412; }
-
-/* SIDEBAR ULTRA-MODERNE */
-[data-testid="stSidebar"] { 
-    background: linear-gradient(180deg, #1e293b 0%, #0f172a 100%);
-    box-shadow: 4px 0 20px rgba(0,0,0,0.1);
-}
-
-[data-testid="stSidebar"] * {
-    color: #e2e8f0 !important;
-}
-
-[data-testid="stSidebar"] h3 {
-    color: white !important;
-    font-weight: 700;
-    font-size: 1.1rem;
-    margin-top: 1.5rem;
-}
-
-[data-testid="stSidebar"] .stRadio > label {
-    font-weight: 600;
-    color: white !important;
-    font-size: 1rem;
-}
-
-[data-testid="stSidebar"] [data-baseweb="radio"] {
-    background: rgba(255,255,255,0.05);
-    border-radius: 12px;
-    padding: 0.8rem 1rem;
-    margin: 0.3rem 0;
-    transition: all 0.3s ease;
-}
-
-[data-testid="stSidebar"] [data-baseweb="radio"]:hover {
-    background: rgba(99, 102, 241, 0.2);
-    transform: translateX(5px);
-}
-
-/* BOUTONS MODERNES */
-.stButton > button {
-    border-radius: 12px;
-    font-weight: 600;
-    padding: 0.6rem 1.5rem;
-    transition: all .3s cubic-bezier(0.4, 0, 0.2, 1);
-    border: none;
-    box-shadow: 0 4px 12px rgba(0,0,0,.1);
-}
-
-.stButton > button:hover {
-    transform: translateY(-3px);
-    box-shadow: 0 8px 20px rgba(99, 102, 241, 0.3);
-}
-
-.stButton > button[kind="primary"] {
-    background: linear-gradient(135deg, var(--primary) 0%, var(--primary-dark) 100%);
-}
-
-/* FORMULAIRES ÉLÉGANTS - VISIBILITÉ AMÉLIORÉE */
-.stTextInput > div > div > input,
-.stTextArea > div > div > textarea,
-.stDateInput > div > div > input {
-    border-radius: 12px;
-    border: 2px solid #cbd5e1 !important;
-    transition: all 0.3s ease;
-    padding: 0.8rem;
-    background-color: #ffffff !important;
-    color: #1e293b !important;
-    font-size: 1rem !important;
-}
-
-.stTextInput > div > div > input:focus,
-.stTextArea > div > div > textarea:focus,
-.stDateInput > div > div > input:focus {
-    border-color: var(--primary) !important;
-    box-shadow: 0 0 0 3px rgba(99, 102, 241, 0.2) !important;
-}
-
-/* SELECTBOX - VISIBILITÉ OPTIMALE */
-.stSelectbox > div > div {
-    border-radius: 12px !important;
-    border: 2px solid #cbd5e1 !important;
-    background-color: #ffffff !important;
-}
-
-.stSelectbox > div > div > div {
-    background-color: #ffffff !important;
-    color: #1e293b !important;
-    font-size: 1rem !important;
-    padding: 0.5rem !important;
-}
-
-.stSelectbox [data-baseweb="select"] > div {
-    background-color: #ffffff !important;
-    border-radius: 10px !important;
-}
-
-.stSelectbox [data-baseweb="select"] span {
-    color: #1e293b !important;
-    font-weight: 500 !important;
-}
-
-/* DROPDOWN MENU */
-[data-baseweb="popover"] {
-    background-color: #ffffff !important;
-    border: 2px solid #e2e8f0 !important;
-    border-radius: 12px !important;
-    box-shadow: 0 10px 40px rgba(0,0,0,0.15) !important;
-}
-
-[data-baseweb="menu"] {
-    background-color: #ffffff !important;
-}
+DEMANDES_PAGE_SIZE = 20
+TIMELINE_PAGE_SIZE = 25
+SEARCH_LIMIT = 100
 
-[data-baseweb="menu"] li {
-    color: #1e293b !important;
-    padding: 0.8rem 1rem !important;
-}
-
-[data-baseweb="menu"] li:hover {
-    background-color: #f1f5f9 !important;
-}
-
-/* DATE INPUT SPECIAL */
-.stDateInput > div > div > div > input {
-    background-color: #ffffff !important;
-    color: #1e293b !important;
-    border: 2px solid #cbd5e1 !important;
-    border-radius: 12px !important;
-}
-
-/* LABELS */
-.stTextInput > label,
-.stTextArea > label,
-.stSelectbox > label,
-.stDateInput > label,
-.stMultiSelect > label {
-    color: #334155 !important;
-    font-weight: 600 !important;
-    font-size: 0.95rem !important;
-    margin-bottom: 0.5rem !important;
-}
-
-/* MULTISELECT */
-.stMultiSelect > div > div {
-    border-radius: 12px !important;
-    border: 2px solid #cbd5e1 !important;
-    background-color: #ffffff !important;
-}
-
-.stMultiSelect [data-baseweb="tag"] {
-    background-color: #6366f1 !important;
-    color: white !important;
-    border-radius: 8px !important;
-}
-
-/* TABLEAUX MODERNES */
-[data-testid="stDataFrame"] {
-    border-radius: 16px;
-    overflow: hidden;
-    box-shadow: 0 8px 24px rgba(0,0,0,.08);
-    border: 1px solid #e2e8f0;
-}
+# Dates sans heure (datetime64 dans les DataFrames) affichées en JJ/MM/AAAA
+DATE_COLUMN_CONFIG = {col: st.column_config.DateColumn(format="DD/MM/YYYY")
+                      for col in ("date_entree", "date_fin", "date_debut", "date_livraison", "date_termine")}
 
-/* ONGLETS STYLÉS */
-.stTabs [data-baseweb="tab-list"] {
-    gap: 12px;
-    background: #f8fafc;
-    padding: 0.8rem;
-    border-radius: 16px;
-    box-shadow: inset 0 2px 8px rgba(0,0,0,0.05);
+EXPORT_FORMATS = {
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV (.csv)": ("csv", "text/csv"),
+    "Parquet (.parquet)": ("parquet", "application/vnd.apache.parquet"),
 }
-
-.stTabs [data-baseweb="tab"] {
-    border-radius: 12px;
-    font-weight: 600;
-    padding: 0.8rem 1.8rem;
-    transition: all 0.3s ease;
-}
-
-.stTabs [data-baseweb="tab"]:hover {
-    background: rgba(99, 102, 241, 0.1);
-}
-
-.stTabs [data-baseweb="tab"][aria-selected="true"] {
-    background: linear-gradient(135deg, var(--primary) 0%, var(--primary-dark) 100%);
-    color: white;
-}
-
-/* BARRE DE PROGRESSION ANIMÉE */
-.stProgress > div > div > div > div { 
-    background: linear-gradient(90deg, #10b981 0%, #059669 100%);
-    height: 16px;
-    border-radius: 100px;
-    box-shadow: 0 2px 8px rgba(16, 185, 129, 0.3);
-    animation: pulse 2s ease-in-out infinite;
-}
-
-/* CONTENEURS */
-.stContainer {
-    animation: fadeInUp 0.6s ease-out;
-}
-
-/* EXPANDER */
-.streamlit-expanderHeader {
-    border-radius: 12px;
-    background: #f8fafc;
-    font-weight: 600;
-    transition: all 0.3s ease;
-}
-
-.streamlit-expanderHeader:hover {
-    background: #e2e8f0;
-}
-
-/* DIVIDER ÉLÉGANT */
-hr {
-    border: none;
-    height: 2px;
-    background: linear-gradient(90deg, transparent 0%, var(--primary) 50%, transparent 100%);
-    margin: 2rem 0;
-}
-
-/* METRICS */
-[data-testid="stMetricValue"] {
-    font-size: 2.5rem;
-    font-weight: 800;
-    background: linear-gradient(135deg, var(--primary) 0%, var(--primary-dark) 100%);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-}
-
-/* ALERTES MODERNES */
-.stAlert {
-    border-radius: 16px;
-    border-left: 4px solid;
-    animation: slideInRight 0.5s ease-out;
-}
-
-/* FOOTER */
-.footer-text {
-    text-align: center;
-    color: #94a3b8;
-    padding: 3rem 2rem;
-    font-weight: 500;
-}
-
-/* RESPONSIVE */
-@media (max-width: 768px) {
-    .kpi-value { font-size: 2rem; }
-    .main-header h1 { font-size: 2rem; }
-}
-
-/* SCROLLBAR PERSONNALISÉE */
-::-webkit-scrollbar {
-    width: 10px;
-    height: 10px;
+TIMELINE_HORIZONS = {"Tout": None, "30 jours": 30, "90 jours": 90, "6 mois": 182, "12 mois": 365}
+# Période des tendances : (profondeur en jours, pas d'agrégation pandas)
+TENDANCE_PERIODES = {"90 jours": (90, "D"), "12 mois": (365, "W"),
+                     "3 ans": (3 * 365, "MS"), "Tout": (None, "MS")}
+TENDANCE_SERIES = {
+    "flux": {"creees": "Créées", "validees": "Validées", "terminees": "Terminées"},
+    "stock": {"stock": "Non terminées"},
+    "delais": {"delai_validation_moyen": "Entrée → validation",
+               "delai_realisation_moyen": "Validation → fin"},
 }
+TENDANCE_COLORS = ["#3b82f6", "#f59e0b", "#10b981"]
 
-::-webkit-scrollbar-track {
-    background: #f1f5f9;
-}
+# ═════════════════════════════════════════════════════════════════════
+# FICHIERS STATIQUES (static/, servis par Streamlit)
+# ═════════════════════════════════════════════════════════════════════
+STATIC_DIR = SCRIPT_DIR / "static"
 
-::-webkit-scrollbar-thumb {
-    background: linear-gradient(135deg, var(--primary) 0%, var(--primary-dark) 100%);
-    border-radius: 10px;
-}
+@st.cache_resource
+def static_url(name):
+    """URL d'un fichier de static/ (None s'il n'existe pas), avec sa date de
+    modification pour invalider le cache du navigateur. Calculée une fois
+    par processus."""
+    path = STATIC_DIR / name
+    if not path.exists():
+        return None
+    return f"app/static/{name}?v={int(path.stat().st_mtime)}"
 
-::-webkit-scrollbar-thumb:hover {
-    background: var(--primary-dark);
-}
-</style>
-""", unsafe_allow_html=True)
+# ═════════════════════════════════════════════════════════════════════
+# CSS GLOBAL AMÉLIORÉ - DATA PRO MAX STYLE
+# ═════════════════════════════════════════════════════════════════════
+# Feuille de style servie par Streamlit depuis static/ : mise en cache par le
+# navigateur, chaque rerun n'envoie plus qu'un lien
+st.markdown(f'<link rel="stylesheet" href="{static_url("pilotage.css")}">',
+            unsafe_allow_html=True)
 
 # ═════════════════════════════════════════════════════════════════════
 # FONCTIONS UTILITAIRES
@@ -754,6 +121,8 @@ def safe_index(lst, val, default=0):
 
 def format_date(date_str):
     try:
+        if isinstance(date_str, datetime):
+            return date_str.strftime("%d/%m/%Y")
         date_obj = datetime.strptime(str(date_str)[:10], "%Y-%m-%d")
         return date_obj.strftime("%d/%m/%Y")
     except:
@@ -787,6 +156,27 @@ def get_priority_color(priorite):
     }
     return priority_colors.get(priorite, "gray")
 
+@timed
+def render_export(label, file_prefix, key, columns=None, **filters):
+    """Export à la demande : rien n'est généré tant que l'utilisateur ne l'a
+    pas demandé, puis le fichier est produit en flux depuis SQLite."""
+    col_fmt, col_btn = st.columns([1, 2])
+    with col_fmt:
+        fmt_label = st.selectbox("Format", list(EXPORT_FORMATS), key=f"{key}_fmt",
+                                 label_visibility="collapsed")
+    fmt, mime = EXPORT_FORMATS[fmt_label]
+    with col_btn:
+        if st.button(f"⚙️ {label}", key=f"{key}_prepare"):
+            with st.spinner("Préparation de l'export..."):
+                export_file = export_projets(fmt, columns, **filters)
+            st.download_button(
+                f"📥 Télécharger ({fmt_label})",
+                data=export_file,
+                file_name=f"{file_prefix}_{datetime.now().strftime('%Y%m%d')}.{fmt}",
+                mime=mime,
+                key=f"{key}_download",
+            )
+
 def render_kpi_card(title, value, subtitle, icon, color="#6366f1"):
     """Render a modern KPI card with icon and animations"""
     st.markdown(f"""
@@ -798,6 +188,494 @@ def render_kpi_card(title, value, subtitle, icon, color="#6366f1"):
     </div>
     """, unsafe_allow_html=True)
 
+# ═════════════════════════════════════════════════════════════════════
+# GRAPHIQUES (figures Plotly en cache)
+# ═════════════════════════════════════════════════════════════════════
+# Les figures sont mises en cache sur le contenu (haché) des agrégats qui
+# les alimentent : un graphique dont les données n'ont pas changé n'est pas
+# reconstruit. Les figures renvoyées sont partagées, ne pas les modifier.
+
+@timed
+@st.cache_resource(max_entries=64, show_spinner=False)
+def build_statut_pie(statut_counts):
+    fig_pie = px.pie(
+        statut_counts, 
+        names="statut", 
+        values="count",
+        hole=0.5,
+        color="statut",
+        color_discrete_map=STATUT_COLORS,
+    )
+    fig_pie.update_traces(
+        textposition="inside", 
+        textinfo="percent+label+value",
+        textfont_size=16,
+        textfont_color="white",
+        textfont_family="Inter",
+        marker=dict(line=dict(color='white', width=3))
+    )
+    fig_pie.update_layout(
+        showlegend=True, 
+        margin=dict(t=20, b=20, l=20, r=20),
+        font=dict(family="Inter", size=14),
+        legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5)
+    )
+    return fig_pie
+
+@timed
+@st.cache_resource(max_entries=64, show_spinner=False)
+def build_porteur_bar(porteur_statut):
+    fig_bar = px.bar(
+        porteur_statut, 
+        x="porteur", 
+        y="count",
+        color="statut",
+        color_discrete_map=STATUT_COLORS,
+        barmode="stack",
+        text="count"
+    )
+    fig_bar.update_traces(
+        textposition="inside",
+        textfont_size=14,
+        textfont_color="white",
+        textfont_family="Inter"
+    )
+    fig_bar.update_layout(
+        xaxis_title="Porteur", 
+        yaxis_title="Nombre de demandes",
+        legend_title="Statut", 
+        margin=dict(t=20),
+        showlegend=True,
+        font=dict(family="Inter", size=14),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+    )
+    fig_bar.update_xaxes(showgrid=False)
+    fig_bar.update_yaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)')
+    return fig_bar
+
+@timed
+@st.cache_resource(max_entries=64, show_spinner=False)
+def build_statut_hbar(counts_df, axe, xaxis_title):
+    """Barres horizontales empilées par statut (département ou domaine)."""
+    fig = px.bar(
+        counts_df, 
+        x="count", 
+        y=axe, 
+        color="statut",
+        color_discrete_map=STATUT_COLORS,
+        orientation="h", 
+        barmode="stack",
+        text="count"
+    )
+    fig.update_traces(
+        textposition="inside",
+        textfont_size=11,
+        textfont_color="white",
+        textfont_family="Inter"
+    )
+    fig.update_layout(
+        yaxis_title="", 
+        xaxis_title=xaxis_title, 
+        margin=dict(t=20),
+        font=dict(family="Inter", size=14),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+    )
+    fig.update_xaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)')
+    fig.update_yaxes(showgrid=False)
+    return fig
+
+@timed
+@st.cache_resource(max_entries=64, show_spinner=False)
+def build_priorite_funnel(prio_counts):
+    fig_prio = px.funnel(
+        prio_counts,
+        x="count", 
+        y="priorite",
+        color_discrete_sequence=["#6366f1"],
+        text="count"
+    )
+    fig_prio.update_traces(
+        textposition="inside",
+        textfont_size=14,
+        textfont_color="white",
+        textfont_family="Inter"
+    )
+    fig_prio.update_layout(
+        margin=dict(t=20),
+        font=dict(family="Inter", size=14),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+    )
+    return fig_prio
+
+@timed
+@st.cache_resource(max_entries=64, show_spinner=False)
+def build_timeline(timeline_df):
+    fig_tl = px.timeline(
+        timeline_df,
+        x_start="timeline_start", 
+        x_end="date_livraison",
+        y="libelle", 
+        color="porteur",
+        hover_data=["departement", "statut", "priorite"],
+    )
+    fig_tl.update_yaxes(autorange="reversed")
+    fig_tl.update_layout(
+        margin=dict(t=20), 
+        height=max(350, len(timeline_df)*40+100),
+        xaxis_title="Période",
+        yaxis_title="",
+        font=dict(family="Inter", size=14),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+    )
+    return fig_tl
+
+@timed
+@st.cache_resource(max_entries=64, show_spinner=False)
+def build_tendance(trends, series, yaxis_title):
+    """Courbes des colonnes `series` ({colonne: libellé}) de get_kpi_trends."""
+    long_df = trends.melt(id_vars="jour", value_vars=list(series),
+                          var_name="serie", value_name="valeur")
+    long_df["serie"] = long_df["serie"].map(series)
+    fig = px.line(
+        long_df,
+        x="jour",
+        y="valeur",
+        color="serie",
+        color_discrete_sequence=TENDANCE_COLORS,
+        markers=len(trends) <= 60,
+    )
+    fig.update_layout(
+        margin=dict(t=20),
+        xaxis_title="",
+        yaxis_title=yaxis_title,
+        legend_title="",
+        font=dict(family="Inter", size=14),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5)
+    )
+    fig.update_xaxes(showgrid=False)
+    fig.update_yaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)', rangemode="tozero")
+    return fig
+
+# ═════════════════════════════════════════════════════════════════════
+# SECTIONS À RÉEXÉCUTION PARTIELLE (st.fragment)
+# ═════════════════════════════════════════════════════════════════════
+# Un widget placé dans un fragment ne réexécute que ce fragment, pas tout
+# le script (en-tête, sidebar, autres graphiques). st.rerun() sans argument
+# reste une réexécution complète (après une écriture, par exemple).
+
+def profiled(fn):
+    """À placer sous @st.fragment : une réexécution du fragment seul n'atteint
+    ni start_profile() ni finish_profile() du script, il ouvre donc et clôt
+    sa propre mesure (une ligne JSON) ; dans un rerun complet, simple span."""
+    if not PROFILING:
+        return fn
+    fn_timed = timed(fn)
+    
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if profile_running():
+            return fn_timed(*args, **kwargs)
+        start_profile()
+        try:
+            return fn_timed(*args, **kwargs)
+        finally:
+            finish_profile(f"fragment:{fn.__name__}")
+    return wrapper
+
+@st.fragment(run_every=NOTIFICATIONS_REFRESH)
+@profiled
+def render_unread_badge(email):
+    unread_count = count_unread_notifications(email)
+    if unread_count > 0:
+        st.warning(f"🔔 {unread_count} notification(s) non lue(s)")
+
+@st.fragment
+@profiled
+def render_mes_demandes_liste(email):
+    # Filtre de statut, mode d'affichage et pagination (côté SQLite)
+    col_f, col_m, col_p = st.columns([2, 1, 1])
+    with col_f:
+        filtre_validation = st.multiselect(
+            "Filtrer par statut de validation",
+            ["EN ATTENTE", "VALIDEE", "REJETEE"],
+            default=["EN ATTENTE", "VALIDEE"]
+        )
+    with col_m:
+        mode_affichage = st.radio("Affichage", ["🗂️ Cartes", "📋 Tableau"], horizontal=True)
+    
+    nb_filtrees = count_projets(email_demandeur=email,
+                                validation_status=filtre_validation) if filtre_validation else 0
+    nb_pages = max(1, -(-nb_filtrees // DEMANDES_PAGE_SIZE))
+    with col_p:
+        page = st.number_input("Page", min_value=1, max_value=nb_pages, value=1, step=1,
+                               key="demandes_page") if nb_pages > 1 else 1
+    
+    if nb_filtrees:
+        filtered_demandes = get_user_demandes(email, filtre_validation,
+                                              limit=DEMANDES_PAGE_SIZE,
+                                              offset=(page - 1) * DEMANDES_PAGE_SIZE)
+    else:
+        filtered_demandes = pd.DataFrame(columns=MES_DEMANDES_COLUMNS)
+    st.caption(f"📊 {len(filtered_demandes)} demande(s) affichée(s) sur {nb_filtrees} · page {page}/{nb_pages}")
+    
+    with section("mes_demandes.liste"):
+        if mode_affichage == "📋 Tableau":
+            st.dataframe(filtered_demandes[["id", "libelle", "departement", "validation_status",
+                                            "statut", "porteur", "priorite", "date_entree",
+                                            "date_livraison"]],
+                         use_container_width=True, hide_index=True,
+                         column_config=DATE_COLUMN_CONFIG)
+        else:
+            # Affichage des demandes
+            for _, row in filtered_demandes.iterrows():
+                with st.container():
+                    st.subheader(f"📦 {row['libelle']}")
+    
+                    col1, col2, col3 = st.columns([2, 1, 1])
+                    with col1:
+                        st.caption(f"Demande #{row['id']} · {row['departement']}")
+                    with col2:
+                        val_color = get_validation_color(row['validation_status'])
+                        st.markdown(f":{val_color}[{row['validation_status']}]")
+                    with col3:
+                        stat_color = get_status_color(row['statut'])
+                        st.markdown(f":{stat_color}[{row['statut']}]")
+    
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.write(f"📅 **Date de création:** {format_date(row['date_entree'])}")
+                        st.write(f"📊 **Nature:** {row['nature']}")
+                    with col2:
+                        st.write(f"🗂️ **Domaine:** {row['domaine']}")
+                        st.write(f"⏱️ **Fréquence:** {row['frequence']}")
+    
+                    # Afficher les infos supplémentaires si validé
+                    if row['validation_status'] == 'VALIDEE':
+                        st.write(f"👤 **Porteur assigné:** {row['porteur']}")
+                        st.write(f"⭐ **Priorité:** {row['priorite']}")
+    
+                        if pd.notna(row['date_debut']):
+                            st.write(f"🚀 **Date de début:** {format_date(row['date_debut'])}")
+    
+                        if pd.notna(row['date_livraison']):
+                            st.write(f"📆 **Date de livraison prévue:** {format_date(row['date_livraison'])}")
+    
+                        if row['commentaire_admin']:
+                            st.info(f"💬 **Commentaire admin:** {row['commentaire_admin']}")
+    
+                    # Expander pour l'historique (chargé seulement à la demande)
+                    with st.expander(f"📜 Historique de la demande #{row['id']}"):
+                        if st.toggle("Afficher l'historique", key=f"hist_{row['id']}"):
+                            events = get_projet_events(row['id'])
+                            if events.empty:
+                                st.info("Aucun historique disponible")
+                            for event in events.itertuples():
+                                prefix = f"[{event.timestamp}] " if event.timestamp else ""
+                                for line in f"{prefix}{event.payload}".split('\n'):
+                                    if line.strip():
+                                        st.write(f"• {line}")
+    
+                    st.divider()
+
+@st.fragment
+@profiled
+def render_registre_vue(nb_validees):
+    st.subheader("🔍 Filtres avancés")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        f_dept = st.multiselect("Département", DEPARTEMENTS)
+    with col2:
+        f_stat = st.multiselect("Statut", STATUTS)
+    with col3:
+        f_prio = st.multiselect("Priorité", PRIORITES)
+    with col4:
+        f_porteur = st.multiselect("Porteur", PORTEURS)
+    
+    recherche = st.text_input("🔎 Recherche (libellé, description, commentaire, historique)",
+                              placeholder="ex: extraction marchands", key="registre_recherche")
+    
+    with section("registre.tableau"):
+        if recherche.strip():
+            # Plein texte côté SQLite (FTS5), trié par pertinence
+            fdf = search_projets(recherche, columns=REGISTRE_COLUMNS, limit=SEARCH_LIMIT,
+                                 validation_status="VALIDEE", departement=f_dept,
+                                 statut=f_stat, priorite=f_prio, porteur=f_porteur)
+            st.dataframe(fdf, use_container_width=True, hide_index=True,
+                         column_config=DATE_COLUMN_CONFIG)
+            st.caption(f"🔎 {len(fdf)} résultat(s) pour « {recherche.strip()} », "
+                       f"triés par pertinence (max {SEARCH_LIMIT})")
+        else:
+            fdf = load_data(columns=REGISTRE_COLUMNS, validation_status="VALIDEE",
+                            departement=f_dept, statut=f_stat,
+                            priorite=f_prio, porteur=f_porteur)
+            st.dataframe(fdf, use_container_width=True, hide_index=True,
+                         column_config=DATE_COLUMN_CONFIG)
+            st.caption(f"📊 {len(fdf)} demande(s) affichée(s) sur {nb_validees} validée(s)")
+    
+    # Export (généré uniquement à la demande)
+    render_export("Exporter la sélection", "registre_demandes", "export_registre",
+                  columns=REGISTRE_COLUMNS, validation_status="VALIDEE",
+                  departement=f_dept, statut=f_stat,
+                  priorite=f_prio, porteur=f_porteur)
+
+@st.fragment
+@profiled
+def render_tableau_de_bord():
+    # Filtre départemental
+    st.subheader("🎯 Filtres de vue")
+    dept_options = ["TOUS"] + sorted(DEPARTEMENTS)
+    selected_dept = st.selectbox("Département", dept_options)
+    
+    if selected_dept == "TOUS":
+        counts = get_dashboard_counts()
+        view_title = "📊 Vue Globale - Toutes les demandes validées"
+    else:
+        counts = get_dashboard_counts(selected_dept)
+        view_title = f"📊 Vue Département : {selected_dept}"
+    
+    st.subheader(view_title)
+    
+    if counts.empty:
+        st.warning(f"Aucune demande validée pour le département {selected_dept}.")
+        return
+    
+    # KPIs avec nouveau design
+    par_statut = counts.groupby("statut")["count"].sum()
+    total = int(counts["count"].sum())
+    termines = int(par_statut.get("TERMINE", 0))
+    en_cours = int(par_statut.get("EN COURS", 0))
+    non_commence = int(par_statut.get("NON COMMENCE", 0))
+    progress = termines / total if total > 0 else 0
+    
+    with section("tableau_de_bord.kpis"):
+        k1, k2, k3, k4 = st.columns(4)
+    
+        with k1:
+            render_kpi_card("Total Validé", total, "demandes en production", "📦", "#3b82f6")
+        with k2:
+            render_kpi_card("Terminées", termines, f"{progress:.0%} complétion", "✅", "#10b981")
+        with k3:
+            render_kpi_card("En cours", en_cours, "actives", "⏳", "#f59e0b")
+        with k4:
+            render_kpi_card("Non commencé", non_commence, "à démarrer", "🔴", "#ef4444")
+    
+    st.divider()
+    
+    # Barre de progression animée
+    st.subheader(f"📈 Progression globale : {progress:.0%}")
+    st.progress(progress)
+    
+    st.divider()
+    
+    # GRAPHIQUES AMÉLIORÉS AVEC ÉTIQUETTES DE VALEURS
+    # (figures en cache : seules celles dont les agrégats changent sont reconstruites)
+    g1, g2 = st.columns(2)
+    
+    with g1, section("graphique.statut"):
+        st.subheader("🍩 Répartition par statut")
+        statut_counts = par_statut.sort_values(ascending=False).reset_index()
+        st.plotly_chart(build_statut_pie(statut_counts), use_container_width=True)
+    
+    with g2, section("graphique.porteur"):
+        st.subheader("👥 Charge par porteur")
+        porteur_statut = counts.groupby(['porteur', 'statut'])['count'].sum().reset_index()
+        st.plotly_chart(build_porteur_bar(porteur_statut), use_container_width=True)
+    
+    g3, g4 = st.columns(2)
+    
+    with g3, section("graphique.departement_domaine"):
+        if selected_dept == "TOUS":
+            st.subheader("🏢 Demandes par département")
+            dept_df = counts.groupby(["departement", "statut"])["count"].sum().reset_index()
+            st.plotly_chart(build_statut_hbar(dept_df, "departement", "Nombre de demandes"),
+                            use_container_width=True)
+        else:
+            st.subheader("🎯 Répartition par domaine")
+            dom_df = counts.groupby(["domaine", "statut"])["count"].sum().reset_index()
+            st.plotly_chart(build_statut_hbar(dom_df, "domaine", "Nombre"),
+                            use_container_width=True)
+    
+    with g4, section("graphique.priorite"):
+        st.subheader("⭐ Répartition par priorité")
+        prio_df = counts[counts["priorite"] != "A DEFINIR"]
+        if not prio_df.empty:
+            prio_counts = prio_df.groupby("priorite")["count"].sum().reset_index()
+            prio_counts = prio_counts.sort_values("priorite")
+            st.plotly_chart(build_priorite_funnel(prio_counts), use_container_width=True)
+        else:
+            st.info("Aucune priorité définie pour les demandes validées.")
+    
+    departement = None if selected_dept == "TOUS" else selected_dept
+    render_timeline(departement)
+    render_tendances(departement)
+
+@st.fragment
+@profiled
+def render_timeline(departement):
+    st.subheader("📅 Timeline des livraisons prévues")
+    
+    col_h, col_p = st.columns([2, 1])
+    with col_h:
+        horizon_label = st.selectbox("Horizon", list(TIMELINE_HORIZONS))
+    horizon_days = TIMELINE_HORIZONS[horizon_label]
+    horizon = (datetime.today() + timedelta(days=horizon_days)).strftime("%Y-%m-%d") if horizon_days else None
+    
+    nb_timeline = count_timeline(departement, horizon)
+    nb_pages = max(1, -(-nb_timeline // TIMELINE_PAGE_SIZE))
+    with col_p:
+        page = st.number_input("Page", min_value=1, max_value=nb_pages, value=1, step=1) if nb_pages > 1 else 1
+    
+    with section("tableau_de_bord.timeline"):
+        if nb_timeline:
+            timeline_df = get_timeline(departement, horizon, limit=TIMELINE_PAGE_SIZE,
+                                       offset=(page - 1) * TIMELINE_PAGE_SIZE)
+        
+            if not timeline_df.empty:
+                st.plotly_chart(build_timeline(timeline_df), use_container_width=True)
+                if nb_pages > 1:
+                    st.caption(f"📊 {len(timeline_df)} demande(s) affichée(s) sur {nb_timeline} · page {page}/{nb_pages}")
+            else:
+                st.info("Aucune date de livraison planifiée.")
+        else:
+            st.info("Aucune demande active avec date de livraison.")
+
+@st.fragment
+@profiled
+def render_tendances(departement):
+    st.subheader("📉 Tendances : flux, stock et délais")
+    col_pe, col_po = st.columns(2)
+    with col_pe:
+        periode_label = st.selectbox("Période", list(TENDANCE_PERIODES), index=1)
+    with col_po:
+        tendance_porteur = st.selectbox("Porteur", ["TOUS"] + PORTEURS[1:])
+    profondeur, freq = TENDANCE_PERIODES[periode_label]
+    debut = (datetime.today() - timedelta(days=profondeur)).strftime("%Y-%m-%d") if profondeur else None
+    
+    with section("tableau_de_bord.tendances"):
+        trends = get_kpi_trends(departement, None if tendance_porteur == "TOUS" else tendance_porteur,
+                                debut=debut, freq=freq)
+        if trends.empty:
+            st.info("Aucun indicateur sur la période.")
+        else:
+            st.plotly_chart(build_tendance(trends, TENDANCE_SERIES["flux"], "Demandes"),
+                            use_container_width=True)
+            t1, t2 = st.columns(2)
+            with t1:
+                st.markdown("**📦 Stock de demandes non terminées**")
+                st.plotly_chart(build_tendance(trends, TENDANCE_SERIES["stock"], "Demandes"),
+                                use_container_width=True)
+            with t2:
+                st.markdown("**⏱️ Délais moyens (jours)**")
+                st.plotly_chart(build_tendance(trends, TENDANCE_SERIES["delais"], "Jours"),
+                                use_container_width=True)
+
 # ═════════════════════════════════════════════════════════════════════
 # EN-TÊTE MODERNE AVEC LOGO
 # ═════════════════════════════════════════════════════════════════════
@@ -823,15 +701,12 @@ if 'user_role' not in st.session_state:
 # SIDEBAR MODERNE
 # ═════════════════════════════════════════════════════════════════════
 with st.sidebar:
-    # Logo Orange Money en haut de la sidebar
-    import base64
-    logo_path = SCRIPT_DIR / "assets" / "logo_orange_money.png"
-    if logo_path.exists():
-        with open(logo_path, "rb") as f:
-            logo_data = base64.b64encode(f.read()).decode()
+    # Logo Orange Money en haut de la sidebar (servi depuis static/)
+    logo_url = static_url("logo_orange_money.png")
+    if logo_url:
         st.markdown(f'''
         <div style="text-align: center; padding: 1rem 0 1.5rem 0;">
-            <img src="data:image/png;base64,{logo_data}" alt="Orange Money" style="max-width: 150px; height: auto;">
+            <img src="{logo_url}" alt="Orange Money" style="max-width: 150px; height: auto;">
         </div>
         ''', unsafe_allow_html=True)
     
@@ -853,16 +728,13 @@ with st.sidebar:
     else:
         st.success(f"✅ Connecté: {st.session_state.user_email}")
         
-        # Afficher les notifications non lues
-        notif_df = get_user_notifications(st.session_state.user_email)
-        unread_count = len(notif_df[notif_df['statut'] == 'NON LU'])
-        
-        if unread_count > 0:
-            st.warning(f"🔔 {unread_count} notification(s) non lue(s)")
+        # Notifications non lues (rafraîchies seules, sans réexécuter la page)
+        render_unread_badge(st.session_state.user_email)
         
         if st.button("🚪 Déconnexion", use_container_width=True):
             st.session_state.user_email = None
             st.session_state.user_role = 'user'
+            st.session_state.notif_cursors = []
             st.rerun()
     
     st.divider()
@@ -941,7 +813,16 @@ if menu == "➕ Nouvelle demande":
                 )
                 st.success(f"✅ Demande #{projet_id} créée avec succès !")
                 st.info("📧 Vous recevrez une notification dès qu'elle sera traitée par l'administrateur.")
-                st.balloons()
+                
+                # Doublons potentiels : signalés ici et à l'administrateur avant validation
+                similaires = find_similar_projets(libelle.strip(), description.strip(),
+                                                  exclude_id=projet_id)
+                if not similaires.empty:
+                    st.warning("⚠️ Des demandes similaires existent déjà. "
+                               "L'administrateur les vérifiera avant de valider la vôtre.")
+                    st.dataframe(similaires, use_container_width=True, hide_index=True)
+                else:
+                    st.balloons()
             else:
                 st.error("❌ Le libellé et la description sont obligatoires.")
 
@@ -951,88 +832,27 @@ if menu == "➕ Nouvelle demande":
 elif menu == "🎯 Mes demandes":
     st.header("🎯 Mes demandes en cours")
     
-    user_demandes = get_user_demandes(st.session_state.user_email)
+    stats = get_user_demandes_stats(st.session_state.user_email)
     
-    if user_demandes.empty:
+    if stats["total"] == 0:
         st.info("📭 Vous n'avez aucune demande enregistrée pour le moment.")
         st.markdown("💡 **Créez votre première demande** en cliquant sur '➕ Nouvelle demande' dans le menu.")
     else:
         # Statistiques personnelles
         col1, col2, col3, col4 = st.columns(4)
         
-        total_demandes = len(user_demandes)
-        en_attente = len(user_demandes[user_demandes['validation_status'] == 'EN ATTENTE'])
-        validees = len(user_demandes[user_demandes['validation_status'] == 'VALIDEE'])
-        terminees = len(user_demandes[user_demandes['statut'] == 'TERMINE'])
-        
         with col1:
-            render_kpi_card("Total", total_demandes, "demandes", "📦", "#3b82f6")
+            render_kpi_card("Total", stats["total"], "demandes", "📦", "#3b82f6")
         with col2:
-            render_kpi_card("En attente", en_attente, "validation", "⏳", "#f59e0b")
+            render_kpi_card("En attente", stats["en_attente"], "validation", "⏳", "#f59e0b")
         with col3:
-            render_kpi_card("Validées", validees, "en cours", "✅", "#10b981")
+            render_kpi_card("Validées", stats["validees"], "en cours", "✅", "#10b981")
         with col4:
-            render_kpi_card("Terminées", terminees, "livrées", "👍", "#10b981")
+            render_kpi_card("Terminées", stats["terminees"], "livrées", "👍", "#10b981")
         
         st.divider()
         
-        # Filtre de statut
-        filtre_validation = st.multiselect(
-            "Filtrer par statut de validation",
-            ["EN ATTENTE", "VALIDEE", "REJETEE"],
-            default=["EN ATTENTE", "VALIDEE"]
-        )
-        
-        filtered_demandes = user_demandes[user_demandes['validation_status'].isin(filtre_validation)]
-        
-        # Affichage des demandes
-        for _, row in filtered_demandes.iterrows():
-            with st.container():
-                st.subheader(f"📦 {row['libelle']}")
-                
-                col1, col2, col3 = st.columns([2, 1, 1])
-                with col1:
-                    st.caption(f"Demande #{row['id']} · {row['departement']}")
-                with col2:
-                    val_color = get_validation_color(row['validation_status'])
-                    st.markdown(f":{val_color}[{row['validation_status']}]")
-                with col3:
-                    stat_color = get_status_color(row['statut'])
-                    st.markdown(f":{stat_color}[{row['statut']}]")
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write(f"📅 **Date de création:** {format_date(row['date_entree'])}")
-                    st.write(f"📊 **Nature:** {row['nature']}")
-                with col2:
-                    st.write(f"🗂️ **Domaine:** {row['domaine']}")
-                    st.write(f"⏱️ **Fréquence:** {row['frequence']}")
-                
-                # Afficher les infos supplémentaires si validé
-                if row['validation_status'] == 'VALIDEE':
-                    st.write(f"👤 **Porteur assigné:** {row['porteur']}")
-                    st.write(f"⭐ **Priorité:** {row['priorite']}")
-                    
-                    if row.get('date_debut') and row['date_debut']:
-                        st.write(f"🚀 **Date de début:** {format_date(row['date_debut'])}")
-                    
-                    if row['date_livraison']:
-                        st.write(f"📆 **Date de livraison prévue:** {format_date(row['date_livraison'])}")
-                    
-                    if row['commentaire_admin']:
-                        st.info(f"💬 **Commentaire admin:** {row['commentaire_admin']}")
-                
-                # Expander pour l'historique
-                with st.expander(f"📜 Historique de la demande #{row['id']}"):
-                    if row['historique']:
-                        historique_lines = row['historique'].split('\n')
-                        for line in historique_lines:
-                            if line.strip():
-                                st.write(f"• {line}")
-                    else:
-                        st.info("Aucun historique disponible")
-                
-                st.divider()
+        render_mes_demandes_liste(st.session_state.user_email)
 
 # ═════════════════════════════════════════════════════════════════════
 # PAGE : NOTIFICATIONS
@@ -1040,9 +860,18 @@ elif menu == "🎯 Mes demandes":
 elif menu == "🔔 Notifications":
     st.header("🔔 Mes notifications")
     
-    notif_df = get_user_notifications(st.session_state.user_email)
+    # Pile des curseurs (created_at, id) : un par page déjà parcourue
+    if 'notif_cursors' not in st.session_state:
+        st.session_state.notif_cursors = []
+    cursors = st.session_state.notif_cursors
     
-    if notif_df.empty:
+    notif_df = get_user_notifications(st.session_state.user_email,
+                                      limit=NOTIFICATIONS_PAGE_SIZE + 1,
+                                      before=cursors[-1] if cursors else None)
+    has_more = len(notif_df) > NOTIFICATIONS_PAGE_SIZE
+    notif_df = notif_df.head(NOTIFICATIONS_PAGE_SIZE)
+    
+    if notif_df.empty and not cursors:
         st.info("📭 Aucune notification pour le moment.")
     else:
         # Bouton pour marquer toutes comme lues
@@ -1054,21 +883,36 @@ elif menu == "🔔 Notifications":
         st.divider()
         
         # Afficher les notifications
-        for _, notif in notif_df.iterrows():
-            is_unread = notif['statut'] == 'NON LU'
+        with section("notifications.liste"):
+            for _, notif in notif_df.iterrows():
+                is_unread = notif['statut'] == 'NON LU'
             
-            with st.container():
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    projet_label = notif['projet_libelle'] or 'Demande'
-                    if is_unread:
-                        st.markdown(f"**📦 {projet_label}** 🔴 NOUVEAU")
-                    else:
-                        st.markdown(f"📦 {projet_label}")
-                    st.write(notif['message'])
-                with col2:
-                    st.caption(format_date(str(notif['created_at'])[:10]))
-                st.divider()
+                with st.container():
+                    col1, col2 = st.columns([4, 1])
+                    with col1:
+                        projet_label = notif['projet_libelle'] or 'Demande'
+                        if is_unread:
+                            st.markdown(f"**📦 {projet_label}** 🔴 NOUVEAU")
+                        else:
+                            st.markdown(f"📦 {projet_label}")
+                        st.write(notif['message'])
+                    with col2:
+                        st.caption(format_date(str(notif['created_at'])[:10]))
+                    st.divider()
+        
+        # Navigation entre les pages
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if cursors and st.button("⬅️ Plus récentes", use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col_page:
+            st.caption(f"Page {len(cursors) + 1}")
+        with col_next:
+            if has_more and st.button("Plus anciennes ➡️", use_container_width=True):
+                last = notif_df.iloc[-1]
+                cursors.append((last['created_at'], int(last['id'])))
+                st.rerun()
 
 # ═════════════════════════════════════════════════════════════════════
 # PAGE : DOSSIER EN ATTENTE (Admin uniquement avec validation complète)
@@ -1091,28 +935,59 @@ elif menu == "📂 Dossier en attente":
         st.warning("🔒 Cette section est réservée aux administrateurs. Veuillez vous authentifier.")
         st.stop()
     
-    df = load_data()
-    pending = df[df["validation_status"] == "EN ATTENTE"].copy()
+    display_cols = ['id', 'libelle', 'departement', 'email_demandeur', 'date_entree', 'nature', 'domaine']
+    pending = load_data(columns=display_cols, validation_status="EN ATTENTE")
+    total = count_projets()
     
     col1, col2, col3 = st.columns(3)
     with col1:
         render_kpi_card("En attente", len(pending), "validation", "⏳", "#f59e0b")
     with col2:
-        render_kpi_card("Total", len(df), "demandes", "📦", "#3b82f6")
+        render_kpi_card("Total", total, "demandes", "📦", "#3b82f6")
     with col3:
-        taux = (len(df)-len(pending))/len(df)*100 if len(df)>0 else 0
+        taux = (total-len(pending))/total*100 if total>0 else 0
         render_kpi_card("Traitement", f"{taux:.1f}%", "complétées", "✅", "#10b981")
     
     st.divider()
     
+    # Import en masse (migration de backlogs d'autres équipes)
+    with st.expander("📤 Import en masse (Excel / CSV)"):
+        st.caption(f"Colonnes attendues : {', '.join(IMPORT_COLUMNS)} "
+                   "(+ email_demandeur optionnel, sinon votre email)")
+        fichier = st.file_uploader("Fichier à importer", type=["xlsx", "csv"], key="import_file")
+        if fichier is not None and st.button("📥 Importer les demandes", key="import_btn"):
+            try:
+                if fichier.name.lower().endswith(".csv"):
+                    import_df = pd.read_csv(fichier, sep=None, engine="python", dtype=str,
+                                            encoding="utf-8-sig")
+                else:
+                    import_df = pd.read_excel(fichier, dtype=str)
+                nb_importees, rejetees = import_projets(import_df, st.session_state.user_email)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+            except (zipfile.BadZipFile, KeyError, OSError) as e:
+                # Fichier corrompu ou qui n'est pas un classeur Excel
+                st.error(f"❌ Fichier illisible : {e}")
+            else:
+                st.success(f"✅ {nb_importees} demande(s) importée(s).")
+                if not rejetees.empty:
+                    st.warning(f"⚠️ {len(rejetees)} ligne(s) rejetée(s).")
+                    st.dataframe(rejetees, use_container_width=True, hide_index=True)
+                    st.download_button(
+                        "📥 Télécharger les lignes rejetées (CSV)",
+                        data=rejetees.to_csv(index=False, sep=";").encode("utf-8-sig"),
+                        file_name=f"import_rejets_{datetime.now().strftime('%Y%m%d')}.csv",
+                        mime="text/csv",
+                    )
+    
     if pending.empty:
         st.success("🎉 Toutes les demandes ont été traitées !")
     else:
         st.warning(f"⚠️ {len(pending)} demande(s) nécessite(nt) une validation administrative.")
         
         # Tableau des demandes en attente
-        display_cols = ['id', 'libelle', 'departement', 'email_demandeur', 'date_entree', 'nature', 'domaine']
-        st.dataframe(pending[display_cols], use_container_width=True, hide_index=True)
+        st.dataframe(pending, use_container_width=True, hide_index=True,
+                     column_config=DATE_COLUMN_CONFIG)
         
         st.divider()
         st.subheader("✏️ Valider une demande")
@@ -1122,7 +997,7 @@ elif menu == "📂 Dossier en attente":
                                       pending['id'].tolist())
         
         if id_to_validate:
-            row = pending[pending['id'] == id_to_validate].iloc[0]
+            row = get_projet(id_to_validate)
             
             st.info(f"""
             **📦 {row['libelle']}** (Demande #{row['id']})
@@ -1131,6 +1006,13 @@ elif menu == "📂 Dossier en attente":
             - 📝 Description: {row['description']}
             """)
             
+            similaires = find_similar_projets(row['libelle'], row['description'],
+                                              exclude_id=int(row['id']))
+            if not similaires.empty:
+                st.warning(f"⚠️ {len(similaires)} demande(s) similaire(s) : "
+                           "vérifier un éventuel doublon avant validation.")
+                st.dataframe(similaires, use_container_width=True, hide_index=True)
+            
             with st.form("validation_form"):
                 st.subheader("🔐 Validation administrative")
                 
@@ -1185,77 +1067,79 @@ elif menu == "📂 Dossier en attente":
                     else:
                         st.error("❌ Veuillez assigner un porteur et définir une priorité pour valider la demande.")
         
-        # Export Excel
-        excel_buf = io.BytesIO()
-        pending[display_cols].to_excel(excel_buf, index=False)
-        excel_buf.seek(0)
-        st.download_button(
-            "📥 Exporter les demandes en attente (Excel)",
-            data=excel_buf,
-            file_name=f"demandes_en_attente_{datetime.now().strftime('%Y%m%d')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+        st.divider()
+        st.subheader("⚡ Validation groupée")
+        
+        libelles = dict(zip(pending['id'], pending['libelle']))
+        with st.form("bulk_validation_form"):
+            tout_selectionner = st.checkbox(f"Sélectionner les {len(pending)} demandes en attente")
+            ids_bulk = st.multiselect("Demandes à valider", pending['id'].tolist(),
+                                      format_func=lambda i: f"#{i} · {libelles.get(i, '')}")
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                b_porteur = st.selectbox("Porteur assigné *", PORTEURS, key="bulk_porteur")
+                b_date_debut = st.date_input("📅 Date de début *", value=datetime.today(), key="bulk_debut")
+            with col2:
+                b_priorite = st.selectbox("Priorité *", PRIORITES, key="bulk_priorite")
+                b_date_livraison = st.date_input("Date de livraison prévue", value=datetime.today(),
+                                                 key="bulk_livraison")
+            with col3:
+                b_statut = st.selectbox("Statut initial", STATUTS, key="bulk_statut")
+            b_commentaire = st.text_area("Commentaire pour les demandeurs", height=80, key="bulk_commentaire")
+            
+            if st.form_submit_button("✅ VALIDER LA SÉLECTION", use_container_width=True, type="primary"):
+                ids_cibles = pending['id'].tolist() if tout_selectionner else ids_bulk
+                if not ids_cibles:
+                    st.error("❌ Sélectionnez au moins une demande.")
+                elif b_porteur != "NON ASSIGNE" and b_priorite != "A DEFINIR":
+                    nb = validate_projets_admin_bulk(
+                        ids_cibles, b_statut, b_porteur, b_priorite,
+                        b_date_livraison.strftime("%Y-%m-%d"), b_commentaire,
+                        b_date_debut.strftime("%Y-%m-%d")
+                    )
+                    if nb < len(ids_cibles):
+                        # Toast : reste affiché après le st.rerun()
+                        st.toast(f"⚠️ {len(ids_cibles) - nb} demande(s) déjà traitée(s) entre-temps, ignorée(s).")
+                    st.success(f"✅ {nb} demande(s) validée(s) avec succès !")
+                    st.rerun()
+                else:
+                    st.error("❌ Veuillez assigner un porteur et définir une priorité pour valider la sélection.")
+        
+        # Export (généré uniquement à la demande)
+        render_export("Exporter les demandes en attente", "demandes_en_attente", "export_pending",
+                      columns=display_cols, validation_status="EN ATTENTE")
 
 # ═════════════════════════════════════════════════════════════════════
 # PAGE : REGISTRE DES DEMANDES
 # ═════════════════════════════════════════════════════════════════════
 elif menu == "📋 Registre des demandes":
     st.header("📋 Registre complet des demandes")
-    df = load_data()
     
     # Ne montrer QUE les demandes validées dans le registre
-    df_validated = df[df['validation_status'] == 'VALIDEE'].copy()
+    nb_validees = count_projets(validation_status="VALIDEE")
     
-    if df_validated.empty:
+    if nb_validees == 0:
         st.info("📭 Aucune demande validée pour le moment.")
         st.stop()
     
-    tab_view, tab_edit, tab_delete = st.tabs(
-        ["👁️ Vue d'ensemble", "✏️ Modifier", "🗑️ Supprimer"]
+    ids_validees = load_data(columns=["id"], validation_status="VALIDEE")["id"].tolist()
+    
+    tab_view, tab_edit, tab_bulk, tab_delete = st.tabs(
+        ["👁️ Vue d'ensemble", "✏️ Modifier", "🔄 Statuts en masse", "🗑️ Supprimer"]
     )
     
     with tab_view:
-        st.subheader("🔍 Filtres avancés")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            f_dept = st.multiselect("Département", DEPARTEMENTS)
-        with col2:
-            f_stat = st.multiselect("Statut", STATUTS)
-        with col3:
-            f_prio = st.multiselect("Priorité", PRIORITES)
-        with col4:
-            f_porteur = st.multiselect("Porteur", PORTEURS)
-        
-        fdf = df_validated.copy()
-        if f_dept: fdf = fdf[fdf["departement"].isin(f_dept)]
-        if f_stat: fdf = fdf[fdf["statut"].isin(f_stat)]
-        if f_prio: fdf = fdf[fdf["priorite"].isin(f_prio)]
-        if f_porteur: fdf = fdf[fdf["porteur"].isin(f_porteur)]
-        
-        st.dataframe(fdf, use_container_width=True, hide_index=True)
-        st.caption(f"📊 {len(fdf)} demande(s) affichée(s) sur {len(df_validated)} validée(s)")
-        
-        # Export Excel
-        excel_buf = io.BytesIO()
-        fdf.to_excel(excel_buf, index=False)
-        excel_buf.seek(0)
-        st.download_button(
-            "📥 Exporter la sélection (Excel)",
-            data=excel_buf,
-            file_name=f"registre_demandes_{datetime.now().strftime('%Y%m%d')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+        render_registre_vue(nb_validees)
     
     with tab_edit:
         st.subheader("✏️ Modifier une demande")
         
-        if df_validated.empty:
+        if not ids_validees:
             st.info("Aucune demande validée à modifier.")
         else:
-            ids = df_validated["id"].tolist()
-            id_sel = st.selectbox("Sélectionner l'ID de la demande", ids)
-            row = df_validated[df_validated["id"] == id_sel].iloc[0]
+            id_sel = st.selectbox("Sélectionner l'ID de la demande", ids_validees)
+            row = get_projet(id_sel)
             
             with st.form("edit_form"):
                 col1, col2 = st.columns(2)
@@ -1307,16 +1191,37 @@ elif menu == "📋 Registre des demandes":
                     else:
                         st.error("❌ Mot de passe administrateur incorrect")
     
+    with tab_bulk:
+        st.subheader("🔄 Mise à jour groupée des statuts")
+        
+        with st.form("bulk_statut_form"):
+            ids_statut = st.multiselect("Demandes à mettre à jour", ids_validees)
+            b_statut = st.selectbox("Nouveau statut", STATUTS, key="bulk_statut_registre")
+            b_commentaire = st.text_input("Commentaire (optionnel)", key="bulk_statut_commentaire")
+            
+            st.warning("🔐 Authentification requise")
+            pwd_bulk = st.text_input("Mot de passe Admin *", type="password", key="bulk_statut_pwd")
+            
+            if st.form_submit_button("💾 Appliquer le statut", use_container_width=True, type="primary"):
+                if pwd_bulk != ADMIN_PASSWORD:
+                    st.error("❌ Mot de passe administrateur incorrect")
+                elif not ids_statut:
+                    st.error("❌ Sélectionnez au moins une demande.")
+                else:
+                    nb = update_statut_projets(ids_statut, b_statut, b_commentaire)
+                    st.success(f"✅ {nb} demande(s) mise(s) à jour.")
+                    st.rerun()
+    
     with tab_delete:
         st.warning("⚠️ **Action irréversible** — Réservée aux administrateurs uniquement")
         
-        if df_validated.empty:
+        if not ids_validees:
             st.info("Aucune demande à supprimer.")
         else:
-            id_del = st.selectbox("ID de la demande à supprimer", df_validated["id"].tolist(), key="del_sel")
+            id_del = st.selectbox("ID de la demande à supprimer", ids_validees, key="del_sel")
             
             # Afficher les détails de la demande
-            row_del = df_validated[df_validated["id"] == id_del].iloc[0]
+            row_del = get_projet(id_del)
             st.error(f"""
             **⚠️ Demande à supprimer:**
             - **#{row_del['id']}** - {row_del['libelle']}
@@ -1340,258 +1245,12 @@ elif menu == "📋 Registre des demandes":
 elif menu == "📊 Tableau de bord":
     st.header("📊 Tableau de bord analytique")
     
-    df_raw = load_data()
-    
     # FILTRE CRITIQUE : Ne montrer QUE les demandes VALIDÉES
-    df_validated = df_raw[df_raw['validation_status'] == 'VALIDEE'].copy()
-    
-    if df_validated.empty:
+    if get_dashboard_counts().empty:
         st.info("📊 Aucune demande validée pour le moment. Le tableau de bord sera disponible dès qu'une demande sera validée par l'administrateur.")
         st.stop()
     
-    # Filtre départemental
-    st.subheader("🎯 Filtres de vue")
-    dept_options = ["TOUS"] + sorted(DEPARTEMENTS)
-    selected_dept = st.selectbox("Département", dept_options)
-    
-    if selected_dept == "TOUS":
-        df = df_validated.copy()
-        view_title = "📊 Vue Globale - Toutes les demandes validées"
-    else:
-        df = df_validated[df_validated["departement"] == selected_dept].copy()
-        view_title = f"📊 Vue Département : {selected_dept}"
-    
-    st.subheader(view_title)
-    
-    if df.empty:
-        st.warning(f"Aucune demande validée pour le département {selected_dept}.")
-        st.stop()
-    
-    # KPIs avec nouveau design
-    total = len(df)
-    termines = len(df[df["statut"] == "TERMINE"])
-    en_cours = len(df[df["statut"] == "EN COURS"])
-    non_commence = len(df[df["statut"] == "NON COMMENCE"])
-    progress = termines / total if total > 0 else 0
-    
-    k1, k2, k3, k4 = st.columns(4)
-    
-    with k1:
-        render_kpi_card("Total Validé", total, "demandes en production", "📦", "#3b82f6")
-    with k2:
-        render_kpi_card("Terminées", termines, f"{progress:.0%} complétion", "✅", "#10b981")
-    with k3:
-        render_kpi_card("En cours", en_cours, "actives", "⏳", "#f59e0b")
-    with k4:
-        render_kpi_card("Non commencé", non_commence, "à démarrer", "🔴", "#ef4444")
-    
-    st.divider()
-    
-    # Barre de progression animée
-    st.subheader(f"📈 Progression globale : {progress:.0%}")
-    st.progress(progress)
-    
-    st.divider()
-    
-    # GRAPHIQUES AMÉLIORÉS AVEC ÉTIQUETTES DE VALEURS
-    g1, g2 = st.columns(2)
-    
-    with g1:
-        st.subheader("🍩 Répartition par statut")
-        statut_counts = df['statut'].value_counts().reset_index()
-        statut_counts.columns = ['statut', 'count']
-        
-        fig_pie = px.pie(
-            statut_counts, 
-            names="statut", 
-            values="count",
-            hole=0.5,
-            color="statut",
-            color_discrete_map=STATUT_COLORS,
-        )
-        fig_pie.update_traces(
-            textposition="inside", 
-            textinfo="percent+label+value",
-            textfont_size=16,
-            textfont_color="white",
-            textfont_family="Inter",
-            marker=dict(line=dict(color='white', width=3))
-        )
-        fig_pie.update_layout(
-            showlegend=True, 
-            margin=dict(t=20, b=20, l=20, r=20),
-            font=dict(family="Inter", size=14),
-            legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5)
-        )
-        st.plotly_chart(fig_pie, use_container_width=True)
-    
-    with g2:
-        st.subheader("👥 Charge par porteur")
-        porteur_statut = df.groupby(['porteur', 'statut']).size().reset_index(name='count')
-        
-        fig_bar = px.bar(
-            porteur_statut, 
-            x="porteur", 
-            y="count",
-            color="statut",
-            color_discrete_map=STATUT_COLORS,
-            barmode="stack",
-            text="count"
-        )
-        fig_bar.update_traces(
-            textposition="inside",
-            textfont_size=14,
-            textfont_color="white",
-            textfont_family="Inter"
-        )
-        fig_bar.update_layout(
-            xaxis_title="Porteur", 
-            yaxis_title="Nombre de demandes",
-            legend_title="Statut", 
-            margin=dict(t=20),
-            showlegend=True,
-            font=dict(family="Inter", size=14),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-        )
-        fig_bar.update_xaxes(showgrid=False)
-        fig_bar.update_yaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)')
-        st.plotly_chart(fig_bar, use_container_width=True)
-    
-    g3, g4 = st.columns(2)
-    
-    with g3:
-        if selected_dept == "TOUS":
-            st.subheader("🏢 Demandes par département")
-            dept_df = df.groupby(["departement", "statut"]).size().reset_index(name="count")
-            fig_dept = px.bar(
-                dept_df, 
-                x="count", 
-                y="departement", 
-                color="statut",
-                color_discrete_map=STATUT_COLORS,
-                orientation="h", 
-                barmode="stack",
-                text="count"
-            )
-            fig_dept.update_traces(
-                textposition="inside",
-                textfont_size=11,
-                textfont_color="white",
-                textfont_family="Inter"
-            )
-            fig_dept.update_layout(
-                yaxis_title="", 
-                xaxis_title="Nombre de demandes", 
-                margin=dict(t=20),
-                font=dict(family="Inter", size=14),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-            )
-            fig_dept.update_xaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)')
-            fig_dept.update_yaxes(showgrid=False)
-            st.plotly_chart(fig_dept, use_container_width=True)
-        else:
-            st.subheader("🎯 Répartition par domaine")
-            dom_df = df.groupby(["domaine", "statut"]).size().reset_index(name="count")
-            fig_dom = px.bar(
-                dom_df, 
-                x="count", 
-                y="domaine", 
-                color="statut",
-                color_discrete_map=STATUT_COLORS,
-                orientation="h", 
-                barmode="stack",
-                text="count"
-            )
-            fig_dom.update_traces(
-                textposition="inside",
-                textfont_size=11,
-                textfont_color="white",
-                textfont_family="Inter"
-            )
-            fig_dom.update_layout(
-                yaxis_title="", 
-                xaxis_title="Nombre", 
-                margin=dict(t=20),
-                font=dict(family="Inter", size=14),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-            )
-            fig_dom.update_xaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)')
-            fig_dom.update_yaxes(showgrid=False)
-            st.plotly_chart(fig_dom, use_container_width=True)
-    
-    with g4:
-        st.subheader("⭐ Répartition par priorité")
-        prio_df = df[df["priorite"] != "A DEFINIR"]
-        if not prio_df.empty:
-            prio_counts = prio_df.groupby("priorite").size().reset_index(name="count")
-            prio_counts = prio_counts.sort_values("priorite")
-            
-            fig_prio = px.funnel(
-                prio_counts,
-                x="count", 
-                y="priorite",
-                color_discrete_sequence=["#6366f1"],
-                text="count"
-            )
-            fig_prio.update_traces(
-                textposition="inside",
-                textfont_size=14,
-                textfont_color="white",
-                textfont_family="Inter"
-            )
-            fig_prio.update_layout(
-                margin=dict(t=20),
-                font=dict(family="Inter", size=14),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-            )
-            st.plotly_chart(fig_prio, use_container_width=True)
-        else:
-            st.info("Aucune priorité définie pour les demandes validées.")
-    
-    # Timeline des livraisons
-    st.subheader("📅 Timeline des livraisons prévues")
-    timeline_df = df[
-        (df["statut"].isin(["EN COURS", "NON COMMENCE"])) &
-        (df["date_livraison"] != "")
-    ].copy()
-    
-    if not timeline_df.empty:
-        # Utiliser date_debut si disponible, sinon date_entree
-        timeline_df["timeline_start"] = timeline_df.apply(
-            lambda r: r["date_debut"] if r.get("date_debut") and r["date_debut"] else r["date_entree"], axis=1
-        )
-        timeline_df["timeline_start"] = pd.to_datetime(timeline_df["timeline_start"], errors="coerce")
-        timeline_df["date_livraison"] = pd.to_datetime(timeline_df["date_livraison"], errors="coerce")
-        timeline_df = timeline_df.dropna(subset=["timeline_start", "date_livraison"])
-        
-        if not timeline_df.empty:
-            fig_tl = px.timeline(
-                timeline_df,
-                x_start="timeline_start", 
-                x_end="date_livraison",
-                y="libelle", 
-                color="porteur",
-                hover_data=["departement", "statut", "priorite"],
-            )
-            fig_tl.update_yaxes(autorange="reversed")
-            fig_tl.update_layout(
-                margin=dict(t=20), 
-                height=max(350, len(timeline_df)*40+100),
-                xaxis_title="Période",
-                yaxis_title="",
-                font=dict(family="Inter", size=14),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-            )
-            st.plotly_chart(fig_tl, use_container_width=True)
-        else:
-            st.info("Aucune date de livraison planifiée.")
-    else:
-        st.info("Aucune demande active avec date de livraison.")
+    render_tableau_de_bord()
 
 # ═════════════════════════════════════════════════════════════════════
 # FOOTER MODERNE
@@ -1603,3 +1262,15 @@ st.markdown("""
     Développé par le Département Business Intelligence · © 2026
 </div>
 """, unsafe_allow_html=True)
+
+# ═════════════════════════════════════════════════════════════════════
+# PROFIL DU RENDU (PILOTAGE_PROFILE=1)
+# ═════════════════════════════════════════════════════════════════════
+if PROFILING:
+    profile = finish_profile(menu)
+    if profile and st.session_state.user_role == 'admin':
+        with st.expander(f"⏱️ Profil du rendu : {profile['total_ms']:.0f} ms · "
+                         f"{profile['queries']} requête(s) · {profile['rows']} ligne(s)"):
+            spans_df = pd.DataFrame(profile["spans"], columns=["name", "depth", "ms", "queries", "rows"])
+            spans_df["name"] = ["    " * d + n for d, n in zip(spans_df["depth"], spans_df["name"])]
+            st.dataframe(spans_df.drop(columns="depth"), use_container_width=True, hide_index=True)
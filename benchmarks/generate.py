@@ -0,0 +1,117 @@
+"""Générateur de données synthétiques pour les benchmarks du pilotage BI.
+
+Produit des `projets`, `users`, `notifications` et `projet_events` réalistes
+(listes de référence de l'application, dates étalées sur trois ans) dans un
+fichier SQLite créé par init_db().
+
+    python benchmarks/generate.py /tmp/bench.db 100000
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pilotage_data
+from pilotage_data import (
+    DEPARTEMENTS, FREQUENCES, NATURES, DOMAINES, STATUTS, PORTEURS, PRIORITES,
+    EVENT_CREATION, EVENT_VALIDATION, EVENT_STATUT,
+)
+
+# Une demande sur 20 environ vient d'un nouvel utilisateur
+PROJETS_PAR_USER = 20
+BATCH_SIZE = 10000
+
+MOTS = ["rapport", "ventes", "extraction", "clients", "marchands", "mensuel",
+        "tableau", "bord", "distribution", "transactions", "cash-in", "cash-out",
+        "commissions", "agences", "suivi", "activité", "conformité", "risques",
+        "segmentation", "churn", "kpi", "revenus", "partenaires", "campagne"]
+
+def _texte(rng, n_min, n_max):
+    return " ".join(rng.choice(MOTS) for _ in range(rng.randint(n_min, n_max)))
+
+def _projets(rng, n, emails, debut):
+    """Lignes dans l'ordre des colonnes du INSERT INTO projets de generate()."""
+    for _ in range(n):
+        date_entree = debut + timedelta(days=rng.randint(0, 3 * 365))
+        validation = rng.choices(["VALIDEE", "EN ATTENTE", "REJETEE"], [70, 25, 5])[0]
+        statut, porteur, priorite = "NON COMMENCE", "NON ASSIGNE", "A DEFINIR"
+        date_debut = date_livraison = validation_date = date_termine = ""
+        if validation == "VALIDEE":
+            statut = rng.choices(STATUTS, [20, 30, 50])[0]
+            porteur = rng.choice(PORTEURS[1:])
+            priorite = rng.choice(PRIORITES[2:])
+            valide_le = date_entree + timedelta(days=rng.randint(0, 10))
+            validation_date = valide_le.strftime("%Y-%m-%d %H:%M")
+            if statut == "TERMINE":
+                date_termine = min(valide_le + timedelta(days=rng.randint(1, 120)),
+                                   datetime.today()).strftime("%Y-%m-%d")
+            if rng.random() < 0.6:
+                date_debut = (date_entree + timedelta(days=rng.randint(1, 20))).strftime("%Y-%m-%d")
+            date_livraison = (date_entree + timedelta(days=rng.randint(7, 120))).strftime("%Y-%m-%d")
+        yield (
+            rng.choice(DEPARTEMENTS), _texte(rng, 2, 6).capitalize(), _texte(rng, 10, 60),
+            rng.choice(FREQUENCES), date_entree.strftime("%Y-%m-%d"),
+            (date_entree + timedelta(days=rng.randint(7, 90))).strftime("%Y-%m-%d"),
+            date_debut, rng.choice(NATURES), rng.choice(DOMAINES), statut, porteur,
+            priorite, date_livraison, int(validation == "VALIDEE"), validation,
+            validation_date, rng.choice(emails), "",
+            date_entree.strftime("%Y-%m-%d %H:%M:%S"), date_termine,
+        )
+
+def generate(path, n_projets, seed=42):
+    """Crée (ou complète) la base `path` avec `n_projets` demandes synthétiques."""
+    rng = random.Random(seed)
+    pilotage_data.DB_PATH = path
+    pilotage_data.close_connection()
+    pilotage_data.init_db()
+
+    n_users = max(1, n_projets // PROJETS_PAR_USER)
+    emails = [f"user{i}@orange.com" for i in range(n_users)]
+    debut = datetime.today() - timedelta(days=3 * 365)
+
+    with pilotage_data.transaction() as c:
+        c.executemany("INSERT OR IGNORE INTO users (email, nom, departement) VALUES (?, ?, ?)",
+                      [(email, email.split("@")[0], rng.choice(DEPARTEMENTS)) for email in emails])
+        rows = _projets(rng, n_projets, emails, debut)
+        while True:
+            batch = [next(rows, None) for _ in range(BATCH_SIZE)]
+            batch = [r for r in batch if r is not None]
+            if not batch:
+                break
+            dernier_id = c.execute("SELECT COALESCE(MAX(id), 0) FROM projets").fetchone()[0]
+            c.executemany("""
+                INSERT INTO projets
+                (departement, libelle, description, frequence, date_entree, date_fin,
+                 date_debut, nature, domaine, statut, porteur, priorite, date_livraison,
+                 admin_filled, validation_status, validation_date, email_demandeur,
+                 commentaire_admin, created_at, date_termine)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+            """, batch)
+            # Historique et notifications : création, validation, changement de statut
+            for kind, condition, message in [
+                (EVENT_CREATION, "1", "' a été créée avec succès et est en attente de validation."),
+                (EVENT_VALIDATION, "validation_status = 'VALIDEE'", "' a été VALIDÉE."),
+                (EVENT_STATUT, "statut <> 'NON COMMENCE'", "' : statut mis à jour."),
+            ]:
+                c.execute(f"""
+                    INSERT INTO projet_events (projet_id, timestamp, actor, kind, payload)
+                    SELECT id, substr(created_at, 1, 16), email_demandeur, ?, ?
+                    FROM projets WHERE id > ? AND {condition}
+                """, (kind, f"Événement {kind}", dernier_id))
+                c.execute(f"""
+                    INSERT INTO notifications (projet_id, user_email, message, statut, created_at)
+                    SELECT id, email_demandeur, ? || libelle || ?,
+                           CASE WHEN id % 4 = 0 THEN 'NON LU' ELSE 'LU' END,
+                           created_at
+                    FROM projets WHERE id > ? AND {condition}
+                """, ("Votre demande '", message, dernier_id))
+
+    # Insertions directes : indicateurs journaliers recalculés d'un bloc
+    pilotage_data.rebuild_kpi_daily()
+    pilotage_data.get_connection().execute("ANALYZE")
+    return emails
+
+if __name__ == "__main__":
+    generate(sys.argv[1], int(sys.argv[2]))
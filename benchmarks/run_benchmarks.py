@@ -0,0 +1,431 @@
+"""Benchmarks des fonctions de données du pilotage BI.
+
+Génère une base synthétique par taille demandée (fichier SQLite temporaire,
+hors ligne), chronomètre chaque fonction de données et la préparation des
+données de chaque page, puis écrit les résultats en JSON pour comparer deux
+commits.
+
+    python benchmarks/run_benchmarks.py --sizes 10000 100000 --output bench.json
+
+Les lectures sont mesurées à froid (le cache est invalidé avant chaque
+mesure) ; `warm_ms` donne le temps d'un appel servi par le cache. Les
+`query_plans` vérifient que les requêtes par utilisateur / par demande
+passent par un index (temps plat quand les tables grossissent) et
+`stress` lance N threads en lectures / écritures mêlées.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import pilotage_data
+from pilotage_data import (
+    DEPARTEMENTS, STATUTS, PORTEURS, PRIORITES, IMPORT_COLUMNS,
+    REGISTRE_COLUMNS,
+)
+from generate import MOTS, generate
+
+# ═════════════════════════════════════════════════════════════════════
+# REGISTRE DES BENCHMARKS
+# ═════════════════════════════════════════════════════════════════════
+# Chaque benchmark reçoit le contexte de la base (emails, ids...) et
+# retourne le nombre de lignes (ou d'octets) produits.
+BENCHMARKS = []
+
+def benchmark(name, group, write=False):
+    def register(fn):
+        BENCHMARKS.append((name, group, write, fn))
+        return fn
+    return register
+
+def _size(f):
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.close()
+    return size
+
+# ── Fonctions de données ─────────────────────────────────────────────
+@benchmark("load_data_all", "data")
+def _(ctx):
+    return len(pilotage_data.load_data(columns=REGISTRE_COLUMNS))
+
+@benchmark("count_projets_validees", "data")
+def _(ctx):
+    return pilotage_data.count_projets(validation_status="VALIDEE")
+
+@benchmark("get_projet", "data")
+def _(ctx):
+    return int(pilotage_data.get_projet(ctx["rng"].choice(ctx["ids"])) is not None)
+
+@benchmark("get_projet_events", "data")
+def _(ctx):
+    return len(pilotage_data.get_projet_events(ctx["rng"].choice(ctx["ids"])))
+
+@benchmark("get_user_demandes_stats", "data")
+def _(ctx):
+    return pilotage_data.get_user_demandes_stats(ctx["rng"].choice(ctx["emails"]))["total"]
+
+@benchmark("search_projets", "data")
+def _(ctx):
+    return len(pilotage_data.search_projets(" ".join(ctx["rng"].sample(MOTS, 2)),
+                                            columns=REGISTRE_COLUMNS, limit=100,
+                                            validation_status="VALIDEE"))
+
+@benchmark("find_similar_projets", "data")
+def _(ctx):
+    rng = ctx["rng"]
+    return len(pilotage_data.find_similar_projets(" ".join(rng.sample(MOTS, 4)),
+                                                  " ".join(rng.sample(MOTS, 12))))
+
+# ── Préparation des données par page ─────────────────────────────────
+@benchmark("page_mes_demandes", "pages")
+def _(ctx):
+    email = ctx["rng"].choice(ctx["emails"])
+    pilotage_data.get_user_demandes_stats(email)
+    pilotage_data.count_projets(email_demandeur=email)
+    return len(pilotage_data.get_user_demandes(email, limit=20))
+
+@benchmark("page_notifications", "pages")
+def _(ctx):
+    email = ctx["rng"].choice(ctx["emails"])
+    return len(pilotage_data.get_user_notifications(email, limit=20))
+
+@benchmark("notification_badge", "pages")
+def _(ctx):
+    return pilotage_data.count_unread_notifications(ctx["rng"].choice(ctx["emails"]))
+
+@benchmark("page_dossier_en_attente", "pages")
+def _(ctx):
+    pilotage_data.count_projets()
+    return len(pilotage_data.load_data(
+        columns=["id", "libelle", "departement", "email_demandeur", "date_entree"],
+        validation_status="EN ATTENTE"))
+
+@benchmark("page_registre", "pages")
+def _(ctx):
+    pilotage_data.count_projets(validation_status="VALIDEE")
+    pilotage_data.load_data(columns=["id"], validation_status="VALIDEE")
+    return len(pilotage_data.load_data(columns=REGISTRE_COLUMNS, validation_status="VALIDEE"))
+
+@benchmark("registre_filtre", "pages")
+def _(ctx):
+    rng = ctx["rng"]
+    return len(pilotage_data.load_data(
+        columns=REGISTRE_COLUMNS, validation_status="VALIDEE",
+        departement=rng.sample(DEPARTEMENTS, 2), statut=[rng.choice(STATUTS)],
+        priorite=rng.sample(PRIORITES[2:], 2), porteur=rng.sample(PORTEURS[1:], 3)))
+
+@benchmark("page_dashboard", "pages")
+def _(ctx):
+    counts = pilotage_data.get_dashboard_counts()
+    counts.groupby("statut")["count"].sum()
+    counts.groupby(["porteur", "statut"])["count"].sum()
+    counts.groupby(["departement", "statut"])["count"].sum()
+    counts.groupby(["domaine", "statut"])["count"].sum()
+    counts[counts["priorite"] != "A DEFINIR"].groupby("priorite")["count"].sum()
+    horizon = (datetime.today() + timedelta(days=90)).strftime("%Y-%m-%d")
+    pilotage_data.count_timeline(None, horizon)
+    pilotage_data.get_timeline(None, horizon, limit=25)
+    return int(counts["count"].sum())
+
+@benchmark("tendances_12_mois", "pages")
+def _(ctx):
+    debut = (datetime.today() - timedelta(days=365)).strftime("%Y-%m-%d")
+    return len(pilotage_data.get_kpi_trends(debut=debut, freq="W"))
+
+@benchmark("tendances_departement_jour", "pages")
+def _(ctx):
+    debut = (datetime.today() - timedelta(days=90)).strftime("%Y-%m-%d")
+    return len(pilotage_data.get_kpi_trends(ctx["rng"].choice(DEPARTEMENTS), debut=debut, freq="D"))
+
+# ── Exports ──────────────────────────────────────────────────────────
+for _fmt in ("csv", "xlsx", "parquet"):
+    benchmark(f"export_{_fmt}", "exports")(
+        lambda ctx, fmt=_fmt: _size(pilotage_data.export_projets(fmt, validation_status="VALIDEE")))
+
+# ── Moteur analytique : SQLite / DuckDB (mêmes requêtes, même résultat) ──
+def _with_backend(backend, fn):
+    previous = pilotage_data.ANALYTICS_BACKEND, pilotage_data.SNAPSHOT_TTL
+    # Instantané Parquet construit une fois : seules les requêtes sont mesurées
+    pilotage_data.ANALYTICS_BACKEND, pilotage_data.SNAPSHOT_TTL = backend, float("inf")
+    try:
+        return fn()
+    finally:
+        pilotage_data.ANALYTICS_BACKEND, pilotage_data.SNAPSHOT_TTL = previous
+
+def _analytics_dashboard():
+    horizon = (datetime.today() + timedelta(days=90)).strftime("%Y-%m-%d")
+    counts = pilotage_data.get_dashboard_counts()
+    pilotage_data.count_timeline(None, horizon)
+    pilotage_data.get_timeline(None, horizon, limit=25)
+    pilotage_data.count_timeline("BI", None)
+    pilotage_data.get_timeline("BI", None, limit=25, offset=25)
+    return int(counts["count"].sum())
+
+try:
+    import duckdb  # noqa: F401 (dépendance optionnelle)
+    ANALYTICS_BACKENDS = ("sqlite", "duckdb")
+except ImportError:
+    ANALYTICS_BACKENDS = ("sqlite",)
+
+for _backend in ANALYTICS_BACKENDS:
+    benchmark(f"analytics_dashboard_{_backend}", "analytics")(
+        lambda ctx, backend=_backend: _with_backend(backend, _analytics_dashboard))
+
+if "duckdb" in ANALYTICS_BACKENDS:
+    @benchmark("analytics_snapshot_parquet", "analytics", write=True)
+    def _(ctx):
+        pilotage_data._duckdb["snapshot_version"] = None
+        pilotage_data._refresh_snapshot()
+        return pilotage_data._snapshot_path().stat().st_size
+
+# ── Écritures ────────────────────────────────────────────────────────
+@benchmark("add_projet", "writes", write=True)
+def _(ctx):
+    pilotage_data.add_projet("BI", "Benchmark", "Demande de benchmark", "ADHOC",
+                             datetime.today() + timedelta(days=30), "ANALYSE", "INTERNE",
+                             ctx["rng"].choice(ctx["emails"]))
+    return 1
+
+@benchmark("validate_projet_admin", "writes", write=True)
+def _(ctx):
+    id_sel = ctx["pending"].pop()
+    pilotage_data.validate_projet_admin(id_sel, "Benchmark", "Demande de benchmark", "ADHOC",
+                                        "ANALYSE", "INTERNE", "EN COURS", "CYRILLE", "P1",
+                                        datetime.today().strftime("%Y-%m-%d"), "")
+    return 1
+
+@benchmark("edit_projet_registre", "writes", write=True)
+def _(ctx):
+    # Modification depuis le registre (commentaire seul) : kpi_daily inchangée
+    id_sel = ctx["rng"].choice(ctx["validees"])
+    row = pilotage_data.get_projet(id_sel)
+    conn = pilotage_data.get_connection()
+    jours = sorted(pilotage_data._kpi_jours(conn, [id_sel]))
+    query = (f"SELECT * FROM kpi_daily WHERE jour IN ({','.join('?' * len(jours))}) "
+             "ORDER BY jour, departement, porteur")
+    avant = conn.execute(query, jours).fetchall()
+    pilotage_data.validate_projet_admin(id_sel, row["libelle"], row["description"],
+                                        row["frequence"], row["nature"], row["domaine"],
+                                        row["statut"], row["porteur"], row["priorite"],
+                                        row["date_livraison"], "Commentaire de benchmark",
+                                        row["date_debut"])
+    if conn.execute(query, jours).fetchall() != avant:
+        raise AssertionError(f"kpi_daily modifiée par l'édition de la demande #{id_sel}")
+    return 1
+
+@benchmark("update_statut_projets_100", "writes", write=True)
+def _(ctx):
+    return pilotage_data.update_statut_projets(ctx["rng"].sample(ctx["ids"], 100), "EN COURS")
+
+@benchmark("rebuild_kpi_daily", "writes", write=True)
+def _(ctx):
+    pilotage_data.rebuild_kpi_daily()
+    return pilotage_data.get_connection().execute("SELECT COUNT(*) FROM kpi_daily").fetchone()[0]
+
+@benchmark("mark_notifications_read", "writes", write=True)
+def _(ctx):
+    pilotage_data.mark_notifications_read(ctx["rng"].choice(ctx["emails"]))
+    return 1
+
+@benchmark("import_projets_1000", "writes", write=True)
+def _(ctx):
+    df = pd.DataFrame([["BI", f"Import {i}", "Demande importée", "ADHOC", "31/12/2030",
+                        "ANALYSE", "INTERNE"] for i in range(1000)], columns=IMPORT_COLUMNS)
+    return pilotage_data.import_projets(df, ctx["rng"].choice(ctx["emails"]))[0]
+
+# ═════════════════════════════════════════════════════════════════════
+# MESURES
+# ═════════════════════════════════════════════════════════════════════
+def _measure(fn, ctx, repeat, cached):
+    timings, result = [], None
+    for _ in range(repeat):
+        # Lecture à froid : la version des données change avant chaque mesure
+        pilotage_data.bump_data_version()
+        state = ctx["rng"].getstate()
+        start = time.perf_counter()
+        result = fn(ctx)
+        timings.append((time.perf_counter() - start) * 1000)
+    mesure = {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "result": result,
+    }
+    if cached:
+        # Mêmes arguments que la dernière mesure, servis par le cache
+        ctx["rng"].setstate(state)
+        start = time.perf_counter()
+        fn(ctx)
+        mesure["warm_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return mesure
+
+# Requêtes dont le temps doit rester plat quand les tables grossissent
+INDEXED_QUERIES = {
+    "notifications_user": ("SELECT * FROM notifications WHERE user_email = ? "
+                           "ORDER BY created_at DESC, id DESC LIMIT 20", "email"),
+    "notifications_unread": ("SELECT COUNT(*) FROM notifications "
+                             "WHERE user_email = ? AND statut = 'NON LU'", "email"),
+    "projets_demandeur": ("SELECT id FROM projets WHERE email_demandeur = ? "
+                          "ORDER BY id DESC LIMIT 20", "email"),
+    "projets_validation": ("SELECT COUNT(*) FROM projets WHERE validation_status = ? "
+                           "AND departement = ?", ("VALIDEE", "BI")),
+    "projet_events": ("SELECT * FROM projet_events WHERE projet_id = ? ORDER BY id", "id"),
+    "kpi_jour_validation": ("SELECT id FROM projets WHERE substr(validation_date, 1, 10) = ?",
+                            (datetime.today().strftime("%Y-%m-%d"),)),
+}
+
+def _query_plans(ctx):
+    """Plan SQLite de chaque requête indexée (SCAN = parcours complet)."""
+    conn = pilotage_data.get_connection()
+    plans = {}
+    for name, (query, params) in INDEXED_QUERIES.items():
+        if params == "email":
+            params = (ctx["emails"][0],)
+        elif params == "id":
+            params = (ctx["ids"][0],)
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+        details = [row[-1] for row in rows]
+        plans[name] = {"plan": details,
+                       "full_scan": any(d.startswith("SCAN") and "INDEX" not in d for d in details)}
+    return plans
+
+def _stress(ctx, n_threads, ops_per_thread):
+    """N threads en lectures / écritures mêlées : débit et erreurs de verrou."""
+    errors, latences = [], []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local_lat = []
+        try:
+            for _ in range(ops_per_thread):
+                email = rng.choice(ctx["emails"])
+                start = time.perf_counter()
+                try:
+                    if rng.random() < 0.3:
+                        pilotage_data.update_statut_projets([rng.choice(ctx["ids"])],
+                                                            rng.choice(STATUTS))
+                    else:
+                        pilotage_data.count_unread_notifications(email)
+                        pilotage_data.get_user_notifications(email, limit=20)
+                except sqlite3.OperationalError as e:
+                    with lock:
+                        errors.append(str(e))
+                local_lat.append((time.perf_counter() - start) * 1000)
+        finally:
+            pilotage_data.close_connection()
+        with lock:
+            latences.extend(local_lat)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duree = time.perf_counter() - start
+    latences.sort()
+    return {
+        "threads": n_threads,
+        "ops": len(latences),
+        "ops_per_s": round(len(latences) / duree, 1),
+        "p50_ms": round(latences[len(latences) // 2], 3),
+        "p95_ms": round(latences[int(len(latences) * 0.95)], 3),
+        "errors": len(errors),
+        "locked_errors": sum("locked" in e for e in errors),
+    }
+
+def run_size(n_projets, workdir, repeat, n_threads, ops_per_thread, only=None):
+    path = Path(workdir) / f"bench_{n_projets}.db"
+    start = time.perf_counter()
+    emails = generate(path, n_projets)
+    generation_s = time.perf_counter() - start
+
+    conn = pilotage_data.get_connection()
+    ctx = {
+        "rng": random.Random(0),
+        "emails": emails,
+        "ids": [r[0] for r in conn.execute("SELECT id FROM projets")],
+        "pending": [r[0] for r in conn.execute(
+            "SELECT id FROM projets WHERE validation_status = 'EN ATTENTE'")],
+        "validees": [r[0] for r in conn.execute(
+            "SELECT id FROM projets WHERE validation_status = 'VALIDEE'")],
+    }
+    tables = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+              for t in ("projets", "users", "notifications", "projet_events")}
+
+    results = {}
+    # Lectures d'abord : les écritures modifient la base
+    for name, group, write, fn in sorted(BENCHMARKS, key=lambda b: b[2]):
+        if only and name not in only:
+            continue
+        print(f"  [{n_projets}] {name}", file=sys.stderr)
+        cached = not write and group != "exports"
+        results[name] = {"group": group, **_measure(fn, ctx, repeat, cached)}
+
+    return {
+        "size": n_projets,
+        "tables": tables,
+        "db_bytes": path.stat().st_size,
+        "generation_s": round(generation_s, 2),
+        "query_plans": _query_plans(ctx),
+        "benchmarks": results,
+        "stress": _stress(ctx, n_threads, ops_per_thread) if n_threads else None,
+    }
+
+def _meta():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du pilotage BI")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000],
+                        help="nombres de demandes générées (une base par taille)")
+    parser.add_argument("--repeat", type=int, default=5, help="mesures par benchmark")
+    parser.add_argument("--threads", type=int, default=8, help="threads du test de charge (0 : aucun)")
+    parser.add_argument("--ops", type=int, default=200, help="opérations par thread")
+    parser.add_argument("--only", nargs="+", help="noms des benchmarks à lancer")
+    parser.add_argument("--output", help="fichier JSON (sinon sortie standard)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="pilotage_bench_") as workdir:
+        report = {"meta": _meta(), "runs": [
+            run_size(n, workdir, args.repeat, args.threads, args.ops, args.only)
+            for n in args.sizes
+        ]}
+        pilotage_data.close_connection()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1520 @@
+"""Accès aux données du pilotage BI (SQLite), sans dépendance à Streamlit.
+
+Importable par un job batch, une CLI, un test ou un benchmark : seuls des
+modules de la bibliothèque standard sont chargés à l'import ; pandas,
+openpyxl et pyarrow ne sont importés que par les fonctions qui en ont besoin.
+"""
+from __future__ import annotations
+
+import csv
+import functools
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# ═════════════════════════════════════════════════════════════════════
+# CONSTANTES
+# ═════════════════════════════════════════════════════════════════════
+DEPARTEMENTS   = ["OPERATIONS", "PMO", "MARKETING", "MARCHAND",
+                  "DISTRIBUTION", "CONFORMITE", "RISQUES", "DG", "DGA", "SM MARKETING", "BI", "CORPORATE", "IT", "EXTERNE"]
+FREQUENCES     = ["ADHOC", "JOURNALIERE", "HEBDOMADAIRE", "MENSUEL", "2 FOIS PAR SEMAINE", "2 FOIS PAR MOIS"]
+NATURES        = ["EXTRACTION", "ANALYSE", "REPORTING", "DASHBOARD", "AUTRES"]
+DOMAINES       = ["DISTRIBUTION", "MARCHAND", "CLIENT FINAL",
+                  "PARTENAIRES", "INTERNE", "AUTRES"]
+STATUTS        = ["NON COMMENCE", "EN COURS", "TERMINE"]
+PORTEURS       = ["NON ASSIGNE", "CHRISTOL", "JINOR", "CYRILLE",
+                  "DILANE", "SONIA"]
+PRIORITES      = ["A DEFINIR", "DEPRIORISE", "P0", "P1", "P2", "P3", "P4"]
+VALIDATION_STATUTS = ["EN ATTENTE", "VALIDEE", "REJETEE"]
+
+# ═════════════════════════════════════════════════════════════════════
+# INSTRUMENTATION (PILOTAGE_PROFILE=1)
+# ═════════════════════════════════════════════════════════════════════
+# Désactivée, `timed` renvoie la fonction telle quelle et `section` un
+# contexte vide partagé : aucun coût à l'exécution.
+PROFILING = os.environ.get("PILOTAGE_PROFILE", "").lower() not in ("", "0", "false")
+
+profile_logger = logging.getLogger("pilotage.profile")
+if PROFILING and not profile_logger.handlers:
+    profile_logger.addHandler(logging.StreamHandler())
+    profile_logger.setLevel(logging.INFO)
+
+# Mesures de l'exécution en cours (une par thread de session Streamlit)
+_profile = threading.local()
+_NO_SECTION = nullcontext()
+
+def start_profile():
+    _profile.spans = []
+    _profile.depth = 0
+    _profile.queries = 0
+    _profile.rows = 0
+    _profile.start = time.perf_counter()
+
+def profile_running():
+    """Vrai entre start_profile() et finish_profile() dans ce thread."""
+    return getattr(_profile, "spans", None) is not None
+
+def finish_profile(label=""):
+    """Clôt les mesures de l'exécution en cours, les journalise en une ligne
+    JSON et les retourne (None si start_profile() n'a pas été appelé)."""
+    spans = getattr(_profile, "spans", None)
+    if spans is None:
+        return None
+    profile = {
+        "label": label,
+        "total_ms": round((time.perf_counter() - _profile.start) * 1000, 2),
+        "queries": _profile.queries,
+        "rows": _profile.rows,
+        "spans": spans,
+    }
+    _profile.spans = None
+    profile_logger.info(json.dumps(profile, ensure_ascii=False))
+    return profile
+
+def _count_query(statement):
+    _profile.queries = getattr(_profile, "queries", 0) + 1
+
+def _count_rows(result):
+    if isinstance(result, list) or hasattr(result, "columns"):
+        return len(result)
+    return 0
+
+@contextmanager
+def _span(name):
+    spans = getattr(_profile, "spans", None)
+    if spans is None:
+        yield None
+        return
+    record = {"name": name, "depth": _profile.depth}
+    spans.append(record)
+    queries, rows, start = _profile.queries, _profile.rows, time.perf_counter()
+    _profile.depth += 1
+    try:
+        yield record
+    finally:
+        _profile.depth -= 1
+        record["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        record["queries"] = _profile.queries - queries
+        record["rows"] = _profile.rows - rows
+
+def section(name):
+    """Chronomètre un bloc (ex: une section de page) : `with section("kpis"):`."""
+    return _span(name) if PROFILING else _NO_SECTION
+
+def timed(fn):
+    """Chronomètre chaque appel de `fn` : durée, requêtes SQL, lignes lues."""
+    if not PROFILING:
+        return fn
+    
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _span(fn.__name__) as record:
+            rows = getattr(_profile, "rows", 0)
+            result = fn(*args, **kwargs)
+            # Lignes comptées une seule fois (fonction la plus interne)
+            if record is not None and _profile.rows == rows:
+                _profile.rows += _count_rows(result)
+            return result
+    return wrapper
+
+# ═════════════════════════════════════════════════════════════════════
+# BASE DE DONNÉES
+# ═════════════════════════════════════════════════════════════════════
+# Base SQLite à côté du script, sauf si PILOTAGE_DB_PATH est défini
+# (lu à chaque ouverture de connexion : modifiable par les benchmarks / tests)
+DB_PATH = Path(os.environ.get("PILOTAGE_DB_PATH", Path(__file__).parent / "projets_bi.db"))
+
+# Attente maximale (ms) sur un verrou SQLite avant l'erreur « database is locked »
+BUSY_TIMEOUT_MS = int(os.environ.get("PILOTAGE_BUSY_TIMEOUT_MS", "5000"))
+
+# Une connexion par thread : les sessions Streamlit ne partagent jamais
+# un curseur. Les connexions sont fermées avec leur thread.
+_pool = threading.local()
+
+# Écrivain unique : les écritures sont sérialisées dans le processus,
+# les lectures (WAL) ne sont jamais bloquées par elles.
+_write_lock = threading.RLock()
+
+def _open_connection():
+    # isolation_level=None : pas de BEGIN implicite, les transactions sont
+    # ouvertes explicitement par transaction()
+    conn = sqlite3.connect(str(DB_PATH), timeout=BUSY_TIMEOUT_MS / 1000,
+                           isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    if PROFILING:
+        conn.set_trace_callback(_count_query)
+    return conn
+
+def get_connection():
+    conn = getattr(_pool, "conn", None)
+    if conn is None:
+        conn = _pool.conn = _open_connection()
+    return conn
+
+def close_connection():
+    """Ferme la connexion du thread courant (ex: après changement de DB_PATH)."""
+    conn = getattr(_pool, "conn", None)
+    if conn is not None:
+        conn.close()
+        _pool.conn = None
+
+@contextmanager
+def transaction():
+    """Unité de travail : une action métier = une transaction, un commit.
+
+    Les appels imbriqués (ex: add_notification depuis add_projet) rejoignent
+    la transaction en cours ; seul le niveau le plus externe valide ou annule.
+    """
+    conn = get_connection()
+    with _write_lock:
+        depth = getattr(_pool, "tx_depth", 0)
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        _pool.tx_depth = depth + 1
+        try:
+            yield conn.cursor()
+        except BaseException:
+            _pool.tx_depth = depth
+            if depth == 0:
+                conn.rollback()
+            raise
+        _pool.tx_depth = depth
+        if depth == 0:
+            conn.commit()
+
+EVENT_CREATION     = "CREATION"
+EVENT_MODIFICATION = "MODIFICATION"
+EVENT_VALIDATION   = "VALIDATION"
+EVENT_STATUT       = "STATUT"
+EVENT_HISTORIQUE   = "HISTORIQUE"   # entrées reprises de l'ancienne colonne texte
+
+_HISTORIQUE_LINE = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2})\] (.*)$")
+
+def _parse_historique(historique):
+    """Découpe l'ancien texte d'historique en (timestamp, texte) : une ligne
+    « [date] ... » ouvre une entrée, les lignes « → ... » la complètent."""
+    entries = []
+    for line in historique.split("\n"):
+        if not line.strip():
+            continue
+        match = _HISTORIQUE_LINE.match(line)
+        if match:
+            entries.append([match.group(1), match.group(2)])
+        elif entries:
+            entries[-1][1] += "\n" + line
+        else:
+            entries.append(["", line])
+    return entries
+
+def _migrate_historique(c):
+    rows = c.execute("SELECT id, historique FROM projets WHERE historique <> ''").fetchall()
+    events = [
+        (projet_id, timestamp, "", EVENT_HISTORIQUE, texte)
+        for projet_id, historique in rows
+        for timestamp, texte in _parse_historique(historique)
+    ]
+    c.executemany("""
+        INSERT INTO projet_events (projet_id, timestamp, actor, kind, payload)
+        VALUES (?, ?, ?, ?, ?)
+    """, events)
+    c.execute("UPDATE projets SET historique = '' WHERE historique <> ''")
+
+# Colonnes indexées en plein texte (rowid = projets.id) ; `historique`
+# concatène les événements de projet_events
+def _backfill_projets_fts(c):
+    c.execute("""
+        INSERT INTO projets_fts (rowid, libelle, description, commentaire_admin, historique)
+        SELECT p.id, p.libelle, p.description, p.commentaire_admin,
+               COALESCE((SELECT group_concat(e.payload, char(10)) FROM projet_events e
+                         WHERE e.projet_id = p.id), '')
+        FROM projets p
+    """)
+
+# Indicateurs journaliers (kpi_daily) : une ligne par (jour, departement,
+# porteur) avec les demandes créées (date_entree), validées (validation_date)
+# et terminées (date_termine) ce jour-là, plus les sommes et effectifs des
+# délais en jours (entrée → validation, validation → fin). Les lignes d'un
+# jour sont recalculées depuis l'état courant des demandes : les fonctions
+# d'écriture recalculent les jours touchés, rebuild_kpi_daily() tout.
+_KPI_SOURCES = """
+    SELECT date_entree AS jour, departement, porteur,
+           1 AS creees, 0 AS validees, 0 AS terminees,
+           NULL AS delai_validation, NULL AS delai_realisation
+    FROM projets WHERE date_entree {condition}
+    UNION ALL
+    SELECT substr(validation_date, 1, 10), departement, porteur, 0, 1, 0,
+           julianday(substr(validation_date, 1, 10)) - julianday(date_entree), NULL
+    FROM projets
+    WHERE validation_status = 'VALIDEE' AND substr(validation_date, 1, 10) {condition}
+    UNION ALL
+    SELECT date_termine, departement, porteur, 0, 0, 1, NULL,
+           julianday(date_termine) - julianday(substr(validation_date, 1, 10))
+    FROM projets WHERE date_termine {condition}
+"""
+
+def _refresh_kpi_daily(c, jours=None):
+    """Recalcule les lignes de kpi_daily des `jours` (AAAA-MM-JJ), toutes si None."""
+    if jours is None:
+        condition, params = "<> ''", []
+        c.execute("DELETE FROM kpi_daily")
+    else:
+        jours = sorted({j for j in jours if j})
+        if not jours:
+            return
+        condition = f"IN ({','.join('?' * len(jours))})"
+        params = jours * 3
+        c.execute(f"DELETE FROM kpi_daily WHERE jour {condition}", jours)
+    c.execute(f"""
+        INSERT INTO kpi_daily
+        (jour, departement, porteur, creees, validees, terminees,
+         delai_validation_total, delai_validation_n, delai_realisation_total, delai_realisation_n)
+        SELECT jour, departement, porteur, SUM(creees), SUM(validees), SUM(terminees),
+               COALESCE(SUM(delai_validation), 0), COUNT(delai_validation),
+               COALESCE(SUM(delai_realisation), 0), COUNT(delai_realisation)
+        FROM ({_KPI_SOURCES.format(condition=condition)})
+        GROUP BY jour, departement, porteur
+    """, params)
+
+def _kpi_jours(c, ids):
+    """Jours de kpi_daily où comptent actuellement les demandes `ids`."""
+    rows = c.execute(f"""
+        SELECT date_entree, substr(validation_date, 1, 10), date_termine
+        FROM projets WHERE id IN ({','.join('?' * len(ids))})
+    """, list(ids)).fetchall()
+    return {jour for row in rows for jour in row if jour}
+
+def _backfill_date_termine(c):
+    # Dernier passage à TERMINE dans l'historique (événements STATUT ou
+    # lignes reprises de l'ancienne colonne texte), sinon la validation
+    # (validée directement terminée), sinon la dernière mise à jour
+    c.execute("""
+        UPDATE projets SET date_termine = COALESCE(
+            (SELECT NULLIF(substr(MAX(e.timestamp), 1, 10), '') FROM projet_events e
+             WHERE e.projet_id = projets.id AND e.kind IN (?, ?)
+               AND e.payload LIKE 'Statut changé vers: TERMINE%'),
+            NULLIF(substr(validation_date, 1, 10), ''),
+            substr(updated_at, 1, 10))
+        WHERE statut = 'TERMINE'
+    """, (EVENT_STATUT, EVENT_HISTORIQUE))
+
+# Migrations de schéma : chaque entrée (version, instructions) est appliquée
+# une seule fois, dans l'ordre, sur les bases dont le PRAGMA user_version
+# est inférieur. Ne jamais modifier une migration déjà livrée : en ajouter une.
+MIGRATIONS = [
+    (1, [
+        # Index secondaires : notifications par utilisateur, demandes par
+        # demandeur, filtres du registre / tableau de bord
+        "CREATE INDEX IF NOT EXISTS idx_notifications_user "
+        "ON notifications(user_email, statut, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_projets_demandeur "
+        "ON projets(email_demandeur, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_projets_validation "
+        "ON projets(validation_status, departement, statut)",
+    ]),
+    (2, [
+        # Historique en table d'événements (ajout O(1) au lieu de réécrire
+        # la colonne texte `historique` à chaque action)
+        """
+        CREATE TABLE IF NOT EXISTS projet_events (
+            id        INTEGER PRIMARY KEY AUTOINCREMENT,
+            projet_id INTEGER NOT NULL,
+            timestamp TEXT,
+            actor     TEXT DEFAULT '',
+            kind      TEXT,
+            payload   TEXT DEFAULT '',
+            FOREIGN KEY (projet_id) REFERENCES projets(id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_projet_events_projet "
+        "ON projet_events(projet_id, id)",
+        _migrate_historique,
+    ]),
+    (3, [
+        # Pagination par curseur (created_at, id) des notifications
+        "CREATE INDEX IF NOT EXISTS idx_notifications_user_date "
+        "ON notifications(user_email, created_at)",
+    ]),
+    (4, [
+        # Recherche plein texte (FTS5), synchronisée par triggers
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS projets_fts USING fts5(
+            libelle, description, commentaire_admin, historique,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS projets_fts_insert AFTER INSERT ON projets BEGIN
+            INSERT INTO projets_fts (rowid, libelle, description, commentaire_admin, historique)
+            VALUES (new.id, new.libelle, new.description, new.commentaire_admin, '');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS projets_fts_update
+        AFTER UPDATE OF libelle, description, commentaire_admin ON projets BEGIN
+            UPDATE projets_fts
+            SET libelle = new.libelle, description = new.description,
+                commentaire_admin = new.commentaire_admin
+            WHERE rowid = new.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS projets_fts_delete AFTER DELETE ON projets BEGIN
+            DELETE FROM projets_fts WHERE rowid = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS projets_fts_event AFTER INSERT ON projet_events BEGIN
+            UPDATE projets_fts
+            SET historique = CASE WHEN historique = '' THEN new.payload
+                                  ELSE historique || char(10) || new.payload END
+            WHERE rowid = new.projet_id;
+        END
+        """,
+        _backfill_projets_fts,
+    ]),
+    (5, [
+        # Indicateurs journaliers : date de fin des demandes terminées,
+        # index sur les trois dates de kpi_daily et table d'agrégats
+        "ALTER TABLE projets ADD COLUMN date_termine TEXT DEFAULT ''",
+        _backfill_date_termine,
+        "CREATE INDEX IF NOT EXISTS idx_projets_date_entree ON projets(date_entree)",
+        "CREATE INDEX IF NOT EXISTS idx_projets_validation_jour "
+        "ON projets(substr(validation_date, 1, 10))",
+        "CREATE INDEX IF NOT EXISTS idx_projets_date_termine ON projets(date_termine)",
+        """
+        CREATE TABLE IF NOT EXISTS kpi_daily (
+            jour                    TEXT NOT NULL,
+            departement             TEXT,
+            porteur                 TEXT,
+            creees                  INTEGER DEFAULT 0,
+            validees                INTEGER DEFAULT 0,
+            terminees               INTEGER DEFAULT 0,
+            delai_validation_total  REAL    DEFAULT 0,
+            delai_validation_n      INTEGER DEFAULT 0,
+            delai_realisation_total REAL    DEFAULT 0,
+            delai_realisation_n     INTEGER DEFAULT 0,
+            PRIMARY KEY (jour, departement, porteur)
+        )
+        """,
+        _refresh_kpi_daily,
+    ]),
+    (6, [
+        # Effectifs par mot de l'index plein texte (doublons : mots rares)
+        "CREATE VIRTUAL TABLE IF NOT EXISTS projets_fts_vocab USING fts5vocab(projets_fts, col)",
+    ]),
+]
+
+def migrate_db():
+    for version, statements in MIGRATIONS:
+        with transaction() as c:
+            # Relu sous verrou : un autre processus a pu migrer entre-temps
+            if c.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            for step in statements:
+                if callable(step):
+                    step(c)
+                else:
+                    c.execute(step)
+            c.execute(f"PRAGMA user_version = {version}")
+
+@timed
+def init_db():
+    with transaction() as c:
+        # Table principale des projets avec nouveaux champs
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS projets (
+                id                INTEGER PRIMARY KEY AUTOINCREMENT,
+                departement       TEXT,
+                libelle           TEXT,
+                description       TEXT,
+                frequence         TEXT,
+                date_entree       TEXT,
+                date_fin          TEXT,
+                date_debut        TEXT    DEFAULT '',
+                nature            TEXT,
+                domaine           TEXT,
+                statut            TEXT    DEFAULT 'NON COMMENCE',
+                porteur           TEXT    DEFAULT 'NON ASSIGNE',
+                priorite          TEXT    DEFAULT 'A DEFINIR',
+                date_livraison    TEXT    DEFAULT '',
+                admin_filled      INTEGER DEFAULT 0,
+                validation_status TEXT    DEFAULT 'EN ATTENTE',
+                validation_date   TEXT    DEFAULT '',
+                email_demandeur   TEXT    DEFAULT '',
+                commentaire_admin TEXT    DEFAULT '',
+                historique        TEXT    DEFAULT '',
+                created_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    
+        # Table des utilisateurs (demandeurs)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                email       TEXT UNIQUE,
+                nom         TEXT,
+                departement TEXT,
+                created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    
+        # Table des notifications
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS notifications (
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                projet_id  INTEGER,
+                user_email TEXT,
+                message    TEXT,
+                statut     TEXT DEFAULT 'NON LU',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (projet_id) REFERENCES projets(id)
+            )
+        """)
+    
+    # Mise à niveau en place des bases existantes
+    migrate_db()
+
+# ═════════════════════════════════════════════════════════════════════
+# CONSTRUCTION DES REQUÊTES (filtres et colonnes côté SQLite)
+# ═════════════════════════════════════════════════════════════════════
+PROJET_COLUMNS = [
+    "id", "departement", "libelle", "description", "frequence", "date_entree",
+    "date_fin", "date_debut", "nature", "domaine", "statut", "porteur",
+    "priorite", "date_livraison", "admin_filled", "validation_status",
+    "validation_date", "email_demandeur", "commentaire_admin", "historique",
+    "created_at", "updated_at", "date_termine",
+]
+
+# Colonnes chargées par page (les TEXT volumineux ne sont lus qu'à la demande)
+REGISTRE_COLUMNS  = [c for c in PROJET_COLUMNS if c != "historique"]
+MES_DEMANDES_COLUMNS = [c for c in REGISTRE_COLUMNS
+                        if c not in ("email_demandeur", "admin_filled", "created_at", "updated_at")]
+
+def _check_column(col):
+    if col not in PROJET_COLUMNS:
+        raise ValueError(f"Colonne inconnue: {col}")
+    return col
+
+def _normalize_filters(filters):
+    """Transforme les filtres en tuple hashable, sans les filtres vides."""
+    normalized = []
+    for col, value in sorted(filters.items()):
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            if not value:
+                continue
+            value = tuple(value)
+        normalized.append((_check_column(col), value))
+    return tuple(normalized)
+
+def _build_where(filters, alias=""):
+    clauses, params = [], []
+    for col, value in filters:
+        col = f"{alias}{col}"
+        if isinstance(value, tuple):
+            clauses.append(f"{col} IN ({','.join('?' * len(value))})")
+            params.extend(value)
+        else:
+            clauses.append(f"{col} = ?")
+            params.append(value)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+# Types pandas des colonnes de `projets` : listes de référence en catégories
+# (complétées des valeurs hors liste présentes en base), dates en datetime64
+CATEGORY_COLUMNS = {
+    "departement": DEPARTEMENTS, "frequence": FREQUENCES, "nature": NATURES,
+    "domaine": DOMAINES, "statut": STATUTS, "porteur": PORTEURS,
+    "priorite": PRIORITES, "validation_status": VALIDATION_STATUTS,
+}
+DATE_COLUMNS = ["date_entree", "date_fin", "date_debut", "date_livraison",
+                "validation_date", "created_at", "updated_at", "date_termine"]
+TEXT_COLUMNS = ["libelle", "description", "email_demandeur", "commentaire_admin",
+                "historique", "extrait"]
+
+# Type des colonnes texte libre, ex: PILOTAGE_STRING_DTYPE=string[pyarrow]
+# (vide : type par défaut de pandas, déjà adossé à pyarrow à partir de pandas 3)
+STRING_DTYPE = os.environ.get("PILOTAGE_STRING_DTYPE", "")
+
+def _apply_dtypes(df):
+    """Convertit en place les colonnes connues d'un DataFrame de projets."""
+    import pandas as pd
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            categories = CATEGORY_COLUMNS[col]
+            hors_liste = sorted(set(df[col].dropna()) - set(categories))
+            df[col] = pd.Categorical(df[col], categories=categories + hors_liste)
+        elif col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(df[col], format="ISO8601", errors="coerce")
+        elif STRING_DTYPE and col in TEXT_COLUMNS:
+            df[col] = df[col].astype(STRING_DTYPE)
+    return df
+
+def build_projets_query(columns=None, filters=(), limit=None, offset=0):
+    """Requête paramétrée sur `projets` : projection sur `columns`, filtres
+    d'égalité (valeur simple) ou d'appartenance (liste) sur `filters`,
+    pagination LIMIT/OFFSET optionnelle."""
+    select = ", ".join(_check_column(c) for c in columns) if columns else "*"
+    where, params = _build_where(filters)
+    query = f"SELECT {select} FROM projets{where} ORDER BY id DESC"
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+    return query, params
+
+# ═════════════════════════════════════════════════════════════════════
+# MOTEUR ANALYTIQUE (agrégats du tableau de bord et timeline)
+# ═════════════════════════════════════════════════════════════════════
+# PILOTAGE_ANALYTICS=duckdb exécute ces requêtes avec DuckDB (colonnaire,
+# multi-thread, dépendance optionnelle) au lieu de SQLite, sur :
+#   - parquet : un instantané Parquet de `projets` à côté de la base,
+#     régénéré après écriture (au plus toutes les PILOTAGE_SNAPSHOT_TTL s) ;
+#   - sqlite  : la base attachée en lecture seule (extension sqlite de DuckDB).
+# Les requêtes et les résultats sont identiques quel que soit le moteur.
+ANALYTICS_BACKEND = os.environ.get("PILOTAGE_ANALYTICS", "sqlite")
+DUCKDB_SOURCE = os.environ.get("PILOTAGE_DUCKDB_SOURCE", "parquet")
+SNAPSHOT_TTL = float(os.environ.get("PILOTAGE_SNAPSHOT_TTL", "0"))
+
+ANALYTICS_COLUMNS = ["id", "libelle", "departement", "domaine", "porteur", "priorite",
+                     "statut", "validation_status", "date_entree", "date_debut",
+                     "date_livraison"]
+
+_duckdb = {"conn": None, "db_path": None, "snapshot_version": None, "snapshot_time": 0.0}
+_duckdb_lock = threading.Lock()
+_duckdb_local = threading.local()
+
+def _snapshot_path():
+    return Path(DB_PATH).with_suffix(".analytics.parquet")
+
+def _refresh_snapshot():
+    """Réécrit l'instantané Parquet si les données ont changé (écriture dans
+    un fichier temporaire puis remplacement atomique)."""
+    version = get_data_version()
+    path = _snapshot_path()
+    if path.exists() and (_duckdb["snapshot_version"] == version
+                          or time.monotonic() - _duckdb["snapshot_time"] < SNAPSHOT_TTL):
+        return
+    import shutil
+    tmp = path.with_suffix(".tmp")
+    with export_projets("parquet", columns=ANALYTICS_COLUMNS) as src, open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp, path)
+    _duckdb["snapshot_version"] = version
+    _duckdb["snapshot_time"] = time.monotonic()
+
+def _duckdb_cursor():
+    import duckdb
+    with _duckdb_lock:
+        # (Re)connexion au premier appel ou si la base a changé
+        if _duckdb["conn"] is None or _duckdb["db_path"] != str(DB_PATH):
+            _duckdb["snapshot_version"] = None
+            conn = duckdb.connect()
+            if DUCKDB_SOURCE == "sqlite":
+                conn.execute("INSTALL sqlite")
+                conn.execute("LOAD sqlite")
+                conn.execute(f"ATTACH '{DB_PATH}' AS src (TYPE sqlite, READ_ONLY)")
+                conn.execute("CREATE VIEW projets AS SELECT * FROM src.projets")
+            elif DUCKDB_SOURCE == "parquet":
+                _refresh_snapshot()
+                conn.execute(f"CREATE VIEW projets AS SELECT * FROM read_parquet('{_snapshot_path()}')")
+            else:
+                raise ValueError(f"Source DuckDB inconnue: {DUCKDB_SOURCE}")
+            _duckdb["conn"] = conn
+            _duckdb["db_path"] = str(DB_PATH)
+        elif DUCKDB_SOURCE == "parquet":
+            _refresh_snapshot()
+    # Un curseur par thread : une connexion DuckDB ne se partage pas entre threads
+    cursor = getattr(_duckdb_local, "cursor", None)
+    if cursor is None or getattr(_duckdb_local, "conn", None) is not _duckdb["conn"]:
+        cursor = _duckdb_local.cursor = _duckdb["conn"].cursor()
+        _duckdb_local.conn = _duckdb["conn"]
+    return cursor
+
+def _analytics_version():
+    """Version des données lues par le moteur analytique, clé de ses caches :
+    avec l'instantané Parquet, celle de l'instantané (en retard sur
+    get_data_version() pendant SNAPSHOT_TTL), sinon celle de la base."""
+    if ANALYTICS_BACKEND == "duckdb" and DUCKDB_SOURCE == "parquet":
+        _duckdb_cursor()
+        return _duckdb["snapshot_version"]
+    return get_data_version()
+
+def _analytics_query(query, params=()) -> pd.DataFrame:
+    if ANALYTICS_BACKEND == "duckdb":
+        return _duckdb_cursor().execute(query, list(params)).df()
+    import pandas as pd
+    return pd.read_sql_query(query, get_connection(), params=list(params))
+
+# ═════════════════════════════════════════════════════════════════════
+# CACHE DES LECTURES (compteur de version des données)
+# ═════════════════════════════════════════════════════════════════════
+# Le compteur est partagé par toutes les sessions du processus : chaque
+# écriture sur `projets` l'incrémente, ce qui invalide les lectures en cache.
+# Les écritures des autres processus (CLI import, job de nuit kpi) sont vues
+# par PRAGMA data_version sur une connexion dédiée, qui n'écrit jamais : la
+# valeur change à chaque commit d'une autre connexion sur la base.
+# Les résultats en cache sont partagés entre appelants : ne pas les modifier.
+# Seule la version courante sert : les caches sont vidés à chaque changement
+# de version (sinon jusqu'à maxsize copies périmées restent en mémoire).
+
+_data_version = 0
+_data_version_lock = threading.Lock()
+_watch = {"conn": None, "db_path": None, "version": None}
+_versioned_caches = []
+
+def _versioned_cache(maxsize):
+    """lru_cache vidé à chaque changement de get_data_version()."""
+    def decorator(func):
+        cached = functools.lru_cache(maxsize=maxsize)(func)
+        _versioned_caches.append(cached)
+        return cached
+    return decorator
+
+def _db_version():
+    global _data_version
+    with _data_version_lock:
+        if _watch["db_path"] != str(DB_PATH):
+            # Autre base : ses valeurs de data_version ne se comparent pas
+            # à celles de la précédente
+            if _watch["conn"] is not None:
+                _watch["conn"].close()
+            _watch["conn"] = sqlite3.connect(str(DB_PATH), isolation_level=None,
+                                             check_same_thread=False)
+            _watch["db_path"] = str(DB_PATH)
+            _data_version += 1
+        return _watch["conn"].execute("PRAGMA data_version").fetchone()[0]
+
+def get_data_version():
+    version = (_data_version, _db_version())
+    if version != _watch["version"]:
+        _watch["version"] = version
+        for cached in _versioned_caches:
+            cached.cache_clear()
+    return version
+
+def bump_data_version():
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+
+@_versioned_cache(maxsize=8)
+def _load_data_cached(data_version, columns, filters, limit, offset) -> pd.DataFrame:
+    import pandas as pd
+    conn = get_connection()
+    query, params = build_projets_query(columns, filters, limit, offset)
+    return _apply_dtypes(pd.read_sql_query(query, conn, params=params))
+
+@_versioned_cache(maxsize=64)
+def _count_projets_cached(data_version, filters):
+    conn = get_connection()
+    where, params = _build_where(filters)
+    return conn.execute(f"SELECT COUNT(*) FROM projets{where}", params).fetchone()[0]
+
+@_versioned_cache(maxsize=256)
+def _get_user_demandes_stats_cached(email, data_version):
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT COUNT(*),
+               SUM(validation_status = 'EN ATTENTE'),
+               SUM(validation_status = 'VALIDEE'),
+               SUM(statut = 'TERMINE')
+        FROM projets
+        WHERE email_demandeur = ?
+    """, (email,)).fetchone()
+    total, en_attente, validees, terminees = (v or 0 for v in row)
+    return {"total": total, "en_attente": en_attente,
+            "validees": validees, "terminees": terminees}
+
+@_versioned_cache(maxsize=8)
+def _get_dashboard_counts_cached(data_version) -> pd.DataFrame:
+    return _analytics_query("""
+        SELECT departement, domaine, porteur, priorite, statut, COUNT(*) AS count
+        FROM projets
+        WHERE validation_status = 'VALIDEE'
+        GROUP BY departement, domaine, porteur, priorite, statut
+        ORDER BY departement, domaine, porteur, priorite, statut
+    """)
+
+def _timeline_where(departement, horizon):
+    where = """
+        WHERE validation_status = 'VALIDEE'
+          AND statut IN ('EN COURS', 'NON COMMENCE')
+          AND date_livraison <> ''
+    """
+    params = []
+    if departement is not None:
+        where += " AND departement = ?"
+        params.append(departement)
+    if horizon is not None:
+        # Barres qui commencent avant la fin de la fenêtre (les retards restent visibles)
+        where += " AND COALESCE(NULLIF(date_debut, ''), date_entree) <= ?"
+        params.append(horizon)
+    return where, params
+
+@_versioned_cache(maxsize=64)
+def _get_timeline_cached(data_version, departement, horizon, limit, offset) -> pd.DataFrame:
+    import pandas as pd
+    where, params = _timeline_where(departement, horizon)
+    df = _analytics_query(f"""
+        SELECT id, libelle, departement, statut, porteur, priorite,
+               COALESCE(NULLIF(date_debut, ''), date_entree) AS timeline_start,
+               date_livraison
+        FROM projets
+        {where}
+        ORDER BY date_livraison, id
+        LIMIT ? OFFSET ?
+    """, params + [limit, offset])
+    for col in ("timeline_start", "date_livraison"):
+        df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+    return df.dropna(subset=["timeline_start", "date_livraison"])
+
+@_versioned_cache(maxsize=64)
+def _count_timeline_cached(data_version, departement, horizon):
+    where, params = _timeline_where(departement, horizon)
+    return int(_analytics_query(f"SELECT COUNT(*) FROM projets {where}", params).iloc[0, 0])
+
+@_versioned_cache(maxsize=64)
+def _get_kpi_trends_cached(data_version, filters, debut, freq) -> pd.DataFrame:
+    import pandas as pd
+    conn = get_connection()
+    where, params = _build_where(filters)
+    df = pd.read_sql_query(f"""
+        SELECT jour, SUM(creees) AS creees, SUM(validees) AS validees,
+               SUM(terminees) AS terminees,
+               SUM(delai_validation_total) AS delai_validation_total,
+               SUM(delai_validation_n) AS delai_validation_n,
+               SUM(delai_realisation_total) AS delai_realisation_total,
+               SUM(delai_realisation_n) AS delai_realisation_n
+        FROM kpi_daily{where}
+        GROUP BY jour
+        ORDER BY jour
+    """, conn, params=params)
+    df["jour"] = pd.to_datetime(df["jour"], errors="coerce", format="ISO8601")
+    df = df.dropna(subset=["jour"]).set_index("jour")
+    # Stock : demandes créées et pas encore terminées, cumulé depuis l'origine
+    # (avant la coupure sur `debut`)
+    stock = (df["creees"] - df["terminees"]).cumsum()
+    trends = df.resample(freq).sum()
+    trends["stock"] = stock.resample(freq).last().ffill().fillna(0).astype(int)
+    for etape in ("validation", "realisation"):
+        n = trends.pop(f"delai_{etape}_n")
+        total = trends.pop(f"delai_{etape}_total")
+        trends[f"delai_{etape}_moyen"] = (total / n.where(n > 0)).round(1)
+    if debut is not None:
+        trends = trends[trends.index >= pd.Timestamp(debut)]
+    return trends.reset_index()
+
+@_versioned_cache(maxsize=256)
+def _get_projet_events_cached(projet_id, data_version) -> pd.DataFrame:
+    import pandas as pd
+    conn = get_connection()
+    return pd.read_sql_query("""
+        SELECT timestamp, actor, kind, payload FROM projet_events
+        WHERE projet_id = ?
+        ORDER BY id
+    """, conn, params=(projet_id,))
+
+# ═════════════════════════════════════════════════════════════════════
+# RECHERCHE PLEIN TEXTE (FTS5)
+# ═════════════════════════════════════════════════════════════════════
+# Poids bm25 des colonnes de projets_fts (libellé > description > commentaire > historique)
+FTS_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+def _fts_query(text):
+    """Requête MATCH sûre : chaque mot devient un préfixe entre guillemets
+    (aucun opérateur FTS5 n'est interprété), tous les mots sont requis."""
+    tokens = re.findall(r"\w+", text)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+@_versioned_cache(maxsize=64)
+def _search_projets_cached(data_version, match, columns, filters, limit) -> pd.DataFrame:
+    import pandas as pd
+    conn = get_connection()
+    select = ", ".join(f"p.{_check_column(c)}" for c in columns) if columns else "p.*"
+    where, params = _build_where(filters, alias="p.")
+    where = where.replace(" WHERE ", " AND ", 1)
+    return _apply_dtypes(pd.read_sql_query(f"""
+        SELECT snippet(projets_fts, -1, '«', '»', '…', 12) AS extrait, {select}
+        FROM projets_fts
+        JOIN projets p ON p.id = projets_fts.rowid
+        WHERE projets_fts MATCH ?{where}
+        ORDER BY bm25(projets_fts, {', '.join(map(str, FTS_WEIGHTS))})
+        LIMIT ?
+    """, conn, params=[match, *params, limit]))
+
+@timed
+def search_projets(text, columns=None, limit=50, **filters) -> pd.DataFrame:
+    """Recherche plein texte (libellé, description, commentaire admin,
+    historique), résultats triés par pertinence (bm25) avec un extrait
+    (colonne `extrait`, termes trouvés entre « »). Mêmes filtres que load_data.
+
+    Ex: search_projets("extraction marchand", validation_status="VALIDEE")
+    """
+    match = _fts_query(text)
+    if not match:
+        import pandas as pd
+        return _apply_dtypes(pd.DataFrame(columns=["extrait", *(columns or PROJET_COLUMNS)]))
+    columns = tuple(columns) if columns else None
+    return _search_projets_cached(get_data_version(), match, columns,
+                                  _normalize_filters(filters), limit)
+
+# ═════════════════════════════════════════════════════════════════════
+# DÉTECTION DES DOUBLONS (libellé / description)
+# ═════════════════════════════════════════════════════════════════════
+# Les candidats viennent de l'index FTS5 (persisté dans la base, tenu à
+# jour par triggers) ; seuls ces quelques candidats sont comparés finement
+# (Jaccard sur trigrammes de caractères).
+# Coût borné quelle que soit la taille de la table : seuls les mots rares
+# (présents dans au plus RARE_TOKEN_DOCS demandes, d'après projets_fts_vocab)
+# sont classés par pertinence (bm25) ; une saisie faite uniquement de mots
+# courants (« rapport mensuel ») ne compare que les DUPLICATE_RECENT
+# demandes correspondantes les plus récentes, sans classement.
+DUPLICATE_CANDIDATES = 50
+RARE_TOKEN_DOCS = 1000
+RARE_TOKENS_MAX = 8
+DUPLICATE_RECENT = 100
+# Les effectifs par mot sont recalculés tous les DOC_COUNT_REFRESH ids
+DOC_COUNT_REFRESH = 1000
+SIMILARITY_THRESHOLD = 0.35
+SIMILAR_COLUMNS = ["id", "libelle", "departement", "validation_status", "statut", "similarite"]
+
+_STOPWORDS = frozenset("""
+    les des une pour par sur avec dans aux que qui est sont son ses leur leurs
+    the and for
+""".split())
+
+def _normalize_text(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+def _shingles(text, k=3):
+    text = _normalize_text(text)
+    return {text[i:i + k] for i in range(max(1, len(text) - k + 1))} if text else set()
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+@functools.lru_cache(maxsize=4096)
+def _token_docs(token, generation):
+    """Nombre (majoré) de demandes dont le libellé ou la description contient
+    `token` ; `generation` (MAX(id) // DOC_COUNT_REFRESH) renouvelle le cache."""
+    row = get_connection().execute("""
+        SELECT SUM(doc) FROM projets_fts_vocab
+        WHERE term = ? AND col IN ('libelle', 'description')
+    """, (token,)).fetchone()
+    return row[0] or 0
+
+@_versioned_cache(maxsize=256)
+def _find_similar_cached(data_version, libelle, description, exclude_id, limit) -> pd.DataFrame:
+    import pandas as pd
+    tokens = [t for t in dict.fromkeys(_normalize_text(f"{libelle} {description}").split())
+              if len(t) > 2 and t not in _STOPWORDS][:64]
+    if not tokens:
+        return pd.DataFrame(columns=SIMILAR_COLUMNS)
+    conn = get_connection()
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM projets").fetchone()[0]
+    docs = {t: _token_docs(t, max_id // DOC_COUNT_REFRESH) for t in tokens}
+    rares = sorted((t for t in tokens if 0 < docs[t] <= RARE_TOKEN_DOCS), key=docs.get)
+    if rares:
+        # Listes courtes : le classement bm25 reste bon marché
+        tokens = rares[:RARE_TOKENS_MAX]
+        ordre = f"bm25(projets_fts, {FTS_WEIGHTS[0]}, {FTS_WEIGHTS[1]}, 0.0, 0.0)"
+        nb_candidats = DUPLICATE_CANDIDATES
+    else:
+        # Parcours par rowid décroissant : FTS5 s'arrête après LIMIT lignes
+        ordre = "projets_fts.rowid DESC"
+        nb_candidats = DUPLICATE_RECENT
+    match = "{libelle description} : (" + " OR ".join(f'"{t}"' for t in tokens) + ")"
+    rows = conn.execute(f"""
+        SELECT p.id, p.libelle, p.departement, p.validation_status, p.statut, p.description
+        FROM projets_fts
+        JOIN projets p ON p.id = projets_fts.rowid
+        WHERE projets_fts MATCH ? AND p.id <> ?
+        ORDER BY {ordre}
+        LIMIT ?
+    """, (match, -1 if exclude_id is None else exclude_id, nb_candidats)).fetchall()
+    
+    # Moyenne des similarités sur le libellé et sur le texte complet
+    cible_libelle = _shingles(libelle)
+    cible_texte = _shingles(f"{libelle} {description}")
+    similaires = []
+    for *cols, desc in rows:
+        score = (_jaccard(cible_libelle, _shingles(cols[1]))
+                 + _jaccard(cible_texte, _shingles(f"{cols[1]} {desc}"))) / 2
+        if score >= SIMILARITY_THRESHOLD:
+            similaires.append((*cols, round(score, 2)))
+    similaires.sort(key=lambda r: r[-1], reverse=True)
+    return pd.DataFrame(similaires[:limit], columns=SIMILAR_COLUMNS)
+
+@timed
+def find_similar_projets(libelle, description="", exclude_id=None, limit=5) -> pd.DataFrame:
+    """Demandes existantes proches (libellé / description), de la plus à la
+    moins similaire ; `similarite` est comprise entre 0 et 1."""
+    return _find_similar_cached(get_data_version(), libelle or "", description or "",
+                                exclude_id, limit)
+
+# ═════════════════════════════════════════════════════════════════════
+# FONCTIONS DE BASE DE DONNÉES
+# ═════════════════════════════════════════════════════════════════════
+
+@timed
+def load_data(columns=None, limit=None, offset=0, **filters) -> pd.DataFrame:
+    """Charge les projets filtrés et projetés par SQLite. Les colonnes à
+    valeurs de référence sont catégorielles, les dates en datetime64 (NaT
+    si vides).
+
+    Ex: load_data(columns=["id", "libelle"], validation_status="VALIDEE",
+                  departement=["PMO", "BI"], limit=20)
+    """
+    columns = tuple(columns) if columns else None
+    return _load_data_cached(get_data_version(), columns, _normalize_filters(filters),
+                             limit, offset)
+
+@timed
+def count_projets(**filters):
+    return _count_projets_cached(get_data_version(), _normalize_filters(filters))
+
+@timed
+def get_dashboard_counts(departement=None) -> pd.DataFrame:
+    """Comptages des demandes validées par (departement, domaine, porteur,
+    priorite, statut) : quelques dizaines de lignes quelle que soit la taille
+    de la table, d'où le tableau de bord dérive tous ses agrégats."""
+    counts = _get_dashboard_counts_cached(_analytics_version())
+    if departement is not None:
+        counts = counts[counts["departement"] == departement]
+    return counts
+
+@timed
+def get_kpi_trends(departement=None, porteur=None, debut=None, freq="W") -> pd.DataFrame:
+    """Tendances lues uniquement dans kpi_daily, agrégées par période pandas
+    `freq` (D, W, MS) à partir de `debut` (AAAA-MM-JJ) : demandes créées,
+    validées, terminées, stock non terminé en fin de période et délais moyens
+    en jours (entrée → validation, validation → fin)."""
+    filters = _normalize_filters({"departement": departement, "porteur": porteur})
+    return _get_kpi_trends_cached(get_data_version(), filters, debut, freq)
+
+@timed
+def rebuild_kpi_daily():
+    """Recalcule toute la table kpi_daily (job de nuit, ou après une
+    écriture faite directement en base sans passer par ce module)."""
+    with transaction() as c:
+        _refresh_kpi_daily(c)
+    bump_data_version()
+
+def iter_projets_chunks(columns=None, chunk_size=1000, **filters):
+    """Parcourt `projets` par lots de `chunk_size` lignes (curseur SQLite).
+    Le premier élément produit est la liste des noms de colonnes."""
+    query, params = build_projets_query(columns, _normalize_filters(filters))
+    cursor = get_connection().execute(query, params)
+    yield [d[0] for d in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+@timed
+def export_projets(fmt, columns=None, **filters):
+    """Exporte les projets filtrés au format `fmt` (xlsx, csv, parquet) dans
+    un fichier temporaire, lot par lot : la mémoire reste bornée quel que
+    soit le nombre de lignes. Retourne le fichier ouvert, positionné au début."""
+    chunks = iter_projets_chunks(columns, **filters)
+    header = next(chunks)
+    raw = tempfile.TemporaryFile(buffering=0)
+    out = io.BufferedWriter(raw)
+    
+    if fmt == "xlsx":
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(header)
+        for rows in chunks:
+            for row in rows:
+                ws.append(row)
+        wb.save(out)
+    elif fmt == "csv":
+        text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="")
+        writer = csv.writer(text, delimiter=";")
+        writer.writerow(header)
+        for rows in chunks:
+            writer.writerows(rows)
+        text.flush()
+        text.detach()
+    elif fmt == "parquet":
+        # pyarrow est installé avec streamlit
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(c, pa.int64() if c in ("id", "admin_filled") else pa.string())
+                            for c in header])
+        with pq.ParquetWriter(out, schema) as pq_writer:
+            for rows in chunks:
+                batch = {c: [row[i] if row[i] is None or c in ("id", "admin_filled") else str(row[i])
+                             for row in rows]
+                         for i, c in enumerate(header)}
+                pq_writer.write_table(pa.table(batch, schema=schema))
+    else:
+        raise ValueError(f"Format d'export inconnu: {fmt}")
+    
+    # Le fichier brut (io.RawIOBase) est accepté tel quel par st.download_button
+    out.flush()
+    out.detach()
+    raw.seek(0)
+    return raw
+
+@timed
+def get_timeline(departement=None, horizon=None, limit=25, offset=0) -> pd.DataFrame:
+    """Demandes actives validées avec date de livraison, triées par échéance.
+
+    `timeline_start` (date_debut, sinon date_entree) et `date_livraison` sont
+    renvoyées en datetime. `horizon` (AAAA-MM-JJ) exclut les barres qui
+    commencent après cette date.
+    """
+    return _get_timeline_cached(_analytics_version(), departement, horizon, limit, offset)
+
+@timed
+def count_timeline(departement=None, horizon=None):
+    return _count_timeline_cached(_analytics_version(), departement, horizon)
+
+@timed
+def get_projet(id_sel):
+    import pandas as pd
+    conn = get_connection()
+    df = pd.read_sql_query("SELECT * FROM projets WHERE id=?", conn, params=(id_sel,))
+    return df.iloc[0] if not df.empty else None
+
+@timed
+def add_projet(departement, libelle, description, frequence, date_fin, nature, domaine, email_demandeur):
+    date_entree = datetime.today().strftime("%Y-%m-%d")
+    with transaction() as c:
+        c.execute("""
+            INSERT INTO projets
+            (departement, libelle, description, frequence, date_entree, date_fin,
+             nature, domaine, email_demandeur, validation_status)
+            VALUES (?,?,?,?,?,?,?,?,?,'EN ATTENTE')
+        """, (departement, libelle, description, frequence, date_entree,
+              date_fin.strftime("%Y-%m-%d"), nature, domaine, email_demandeur))
+        
+        projet_id = c.lastrowid
+        _refresh_kpi_daily(c, [date_entree])
+        add_event(c, projet_id, email_demandeur, EVENT_CREATION,
+                  f"Demande créée par {email_demandeur}")
+        
+        # Créer une notification
+        add_notification(projet_id, email_demandeur, 
+                        f"Votre demande '{libelle}' a été créée avec succès et est en attente de validation.")
+    
+    bump_data_version()
+    return projet_id
+
+IMPORT_COLUMNS = ["departement", "libelle", "description", "frequence",
+                  "date_fin", "nature", "domaine"]
+
+@timed
+def import_projets(df, email_demandeur):
+    """Import en masse de demandes (fichier xlsx/csv déjà lu en DataFrame).
+
+    Les lignes sont validées de façon vectorisée contre les listes de
+    référence, puis insérées en une transaction avec leurs événements et
+    notifications. `email_demandeur` sert de demandeur par défaut si le
+    fichier n'a pas de colonne `email_demandeur`.
+    Retourne (nombre de demandes créées, DataFrame des lignes rejetées).
+    """
+    import pandas as pd
+    df = df.rename(columns=lambda c: str(c).strip().lower())
+    manquantes = [c for c in IMPORT_COLUMNS if c not in df.columns]
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes: {', '.join(manquantes)}")
+    
+    data = pd.DataFrame(index=df.index)
+    for col in IMPORT_COLUMNS:
+        data[col] = df[col].fillna("").astype(str).str.strip()
+    for col in ("departement", "frequence", "nature", "domaine"):
+        data[col] = data[col].str.upper()
+    if "email_demandeur" in df.columns:
+        data["email_demandeur"] = df["email_demandeur"].fillna("").astype(str).str.strip()
+        data.loc[data["email_demandeur"] == "", "email_demandeur"] = email_demandeur
+    else:
+        data["email_demandeur"] = email_demandeur
+    # Formats mêlés dans une même colonne (cellules date d'Excel lues en texte
+    # « 2030-12-31 00:00:00 », saisies « 31/12/2030 ») : chaque valeur est
+    # analysée seule, AAAA-MM-JJ en ISO, le reste jour en premier
+    iso = data["date_fin"].str.match(r"\d{4}-\d{1,2}-\d{1,2}")
+    date_fin = pd.to_datetime(data["date_fin"].where(~iso), errors="coerce",
+                              format="mixed", dayfirst=True)
+    date_fin[iso] = pd.to_datetime(data["date_fin"][iso], errors="coerce", format="ISO8601")
+    data["date_fin"] = date_fin.dt.strftime("%Y-%m-%d")
+    
+    erreurs = pd.Series("", index=data.index)
+    for mask, message in [
+        (~data["departement"].isin(DEPARTEMENTS), "département inconnu"),
+        (~data["frequence"].isin(FREQUENCES), "fréquence inconnue"),
+        (~data["nature"].isin(NATURES), "nature inconnue"),
+        (~data["domaine"].isin(DOMAINES), "domaine inconnu"),
+        (data["libelle"] == "", "libellé vide"),
+        (data["description"] == "", "description vide"),
+        (date_fin.isna(), "date_fin invalide"),
+        (~data["email_demandeur"].str.contains("@", regex=False), "email invalide"),
+    ]:
+        erreurs[mask] += message + "; "
+    
+    valides = data[erreurs == ""]
+    rejetees = df[erreurs != ""].assign(erreurs=erreurs[erreurs != ""].str.rstrip("; "))
+    if valides.empty:
+        return 0, rejetees
+    
+    date_entree = datetime.today().strftime("%Y-%m-%d")
+    with transaction() as c:
+        # Écrivain unique : les nouveaux ids sont tous supérieurs à ce maximum
+        dernier_id = c.execute("SELECT COALESCE(MAX(id), 0) FROM projets").fetchone()[0]
+        c.executemany("""
+            INSERT INTO projets
+            (departement, libelle, description, frequence, date_entree, date_fin,
+             nature, domaine, email_demandeur, validation_status)
+            VALUES (?,?,?,?,?,?,?,?,?,'EN ATTENTE')
+        """, [(r.departement, r.libelle, r.description, r.frequence, date_entree,
+               r.date_fin, r.nature, r.domaine, r.email_demandeur)
+              for r in valides.itertuples(index=False)])
+        c.execute("""
+            INSERT INTO projet_events (projet_id, timestamp, actor, kind, payload)
+            SELECT id, ?, ?, ?, ? FROM projets WHERE id > ?
+        """, (datetime.now().strftime('%Y-%m-%d %H:%M'), email_demandeur, EVENT_CREATION,
+              f"Demande importée par {email_demandeur}", dernier_id))
+        c.execute("""
+            INSERT INTO notifications (projet_id, user_email, message, statut)
+            SELECT id, email_demandeur, ? || libelle || ?, 'NON LU'
+            FROM projets WHERE id > ?
+        """, ("Votre demande '", "' a été créée avec succès et est en attente de validation.",
+              dernier_id))
+        _refresh_kpi_daily(c, [date_entree])
+    
+    bump_data_version()
+    return len(valides), rejetees
+
+@timed
+def update_projet_user(id_sel, libelle, description, frequence, nature, domaine):
+    with transaction() as c:
+        c.execute("""
+            UPDATE projets SET
+                libelle=?, description=?, frequence=?, nature=?, domaine=?,
+                updated_at=CURRENT_TIMESTAMP
+            WHERE id=?
+        """, (libelle, description, frequence, nature, domaine, id_sel))
+        add_event(c, id_sel, "utilisateur", EVENT_MODIFICATION,
+                  "Demande modifiée par l'utilisateur")
+    bump_data_version()
+
+@timed
+def validate_projet_admin(id_sel, libelle, description, frequence, nature, domaine,
+                         statut, porteur, priorite, date_livraison, commentaire_admin, date_debut=""):
+    with transaction() as c:
+        # Récupérer l'email du demandeur
+        row = c.execute("SELECT email_demandeur FROM projets WHERE id=?", (id_sel,)).fetchone()
+        email_demandeur = row[0] if row else ""
+        jours = _kpi_jours(c, [id_sel])
+        
+        # Aussi appelée par la modification depuis le registre : une demande
+        # déjà validée garde sa date de validation (délais de kpi_daily)
+        c.execute("""
+            UPDATE projets SET
+                libelle=?, description=?, frequence=?, nature=?, domaine=?,
+                statut=?, porteur=?, priorite=?, date_livraison=?, date_debut=?,
+                admin_filled=1, validation_status='VALIDEE',
+                validation_date=CASE WHEN validation_status = 'VALIDEE' AND validation_date <> ''
+                                     THEN validation_date ELSE ? END,
+                commentaire_admin=?, updated_at=CURRENT_TIMESTAMP,
+                date_termine=CASE WHEN ? = 'TERMINE'
+                                  THEN COALESCE(NULLIF(date_termine, ''), ?) ELSE '' END
+            WHERE id=?
+        """, (libelle, description, frequence, nature, domaine,
+              statut, porteur, priorite, date_livraison, date_debut,
+              datetime.now().strftime("%Y-%m-%d %H:%M"),
+              commentaire_admin, statut, datetime.today().strftime("%Y-%m-%d"), id_sel))
+        _refresh_kpi_daily(c, jours | _kpi_jours(c, [id_sel]))
+        
+        details = "Demande VALIDÉE par l'administrateur"
+        details += f"\n   → Porteur: {porteur}, Priorité: {priorite}, Statut: {statut}"
+        if date_debut:
+            details += f"\n   → Date de début: {date_debut}"
+        add_event(c, id_sel, "admin", EVENT_VALIDATION, details)
+        
+        # Créer une notification pour le demandeur
+        add_notification(id_sel, email_demandeur,
+                        f"Votre demande '{libelle}' a été VALIDÉE. Porteur assigné: {porteur}. Priorité: {priorite}.")
+    
+    bump_data_version()
+
+@timed
+def validate_projets_admin_bulk(ids, statut, porteur, priorite, date_livraison,
+                                commentaire_admin="", date_debut=""):
+    """Valide plusieurs demandes en une transaction (mêmes porteur, priorité,
+    statut et dates). Seules les demandes encore EN ATTENTE sont validées
+    (une sélection périmée ne revalide pas une demande déjà traitée).
+    Retourne le nombre de demandes validées."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    validation_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+    details = "Demande VALIDÉE par l'administrateur (validation groupée)"
+    details += f"\n   → Porteur: {porteur}, Priorité: {priorite}, Statut: {statut}"
+    if date_debut:
+        details += f"\n   → Date de début: {date_debut}"
+    
+    with transaction() as c:
+        rows = c.execute(
+            f"SELECT id, email_demandeur, libelle FROM projets "
+            f"WHERE id IN ({','.join('?' * len(ids))}) AND validation_status = 'EN ATTENTE'",
+            ids).fetchall()
+        ids = [projet_id for projet_id, _, _ in rows]
+        jours = _kpi_jours(c, ids) if ids else set()
+        c.executemany("""
+            UPDATE projets SET
+                statut=?, porteur=?, priorite=?, date_livraison=?, date_debut=?,
+                admin_filled=1, validation_status='VALIDEE', validation_date=?,
+                commentaire_admin=?, updated_at=CURRENT_TIMESTAMP,
+                date_termine=CASE WHEN ? = 'TERMINE'
+                                  THEN COALESCE(NULLIF(date_termine, ''), ?) ELSE '' END
+            WHERE id=? AND validation_status = 'EN ATTENTE'
+        """, [(statut, porteur, priorite, date_livraison, date_debut,
+               validation_date, commentaire_admin, statut, validation_date[:10], projet_id)
+              for projet_id in ids])
+        nb_validees = c.rowcount if ids else 0
+        if ids:
+            _refresh_kpi_daily(c, jours | _kpi_jours(c, ids))
+        add_events(c, [(projet_id, "admin", EVENT_VALIDATION, details) for projet_id, _, _ in rows])
+        add_notifications([
+            (projet_id, email_demandeur,
+             f"Votre demande '{libelle}' a été VALIDÉE. Porteur assigné: {porteur}. Priorité: {priorite}.")
+            for projet_id, email_demandeur, libelle in rows
+        ])
+    
+    bump_data_version()
+    return nb_validees
+
+def update_statut_projet(id_sel, nouveau_statut, commentaire=""):
+    update_statut_projets([id_sel], nouveau_statut, commentaire)
+
+@timed
+def update_statut_projets(ids, nouveau_statut, commentaire=""):
+    """Change le statut de plusieurs demandes en une transaction.
+    Retourne le nombre de demandes mises à jour."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    details = f"Statut changé vers: {nouveau_statut}"
+    if commentaire:
+        details += f"\n   → Commentaire: {commentaire}"
+    
+    with transaction() as c:
+        # Récupérer l'email du demandeur et le libellé
+        rows = c.execute(
+            f"SELECT id, email_demandeur, libelle FROM projets WHERE id IN ({','.join('?' * len(ids))})",
+            ids).fetchall()
+        ids = [projet_id for projet_id, _, _ in rows]
+        jours = _kpi_jours(c, ids) if ids else set()
+        c.executemany("""
+            UPDATE projets SET
+                statut=?, updated_at=CURRENT_TIMESTAMP,
+                date_termine=CASE WHEN ? = 'TERMINE'
+                                  THEN COALESCE(NULLIF(date_termine, ''), ?) ELSE '' END
+            WHERE id=?
+        """, [(nouveau_statut, nouveau_statut, datetime.today().strftime("%Y-%m-%d"), projet_id)
+              for projet_id in ids])
+        if ids:
+            _refresh_kpi_daily(c, jours | _kpi_jours(c, ids))
+        add_events(c, [(projet_id, "admin", EVENT_STATUT, details) for projet_id, _, _ in rows])
+        
+        # Créer les notifications
+        add_notifications([
+            (projet_id, email_demandeur,
+             f"Statut de votre demande '{libelle}' mis à jour: {nouveau_statut}")
+            for projet_id, email_demandeur, libelle in rows
+        ])
+    
+    bump_data_version()
+    return len(rows)
+
+@timed
+def delete_projet(id_sel):
+    with transaction() as c:
+        jours = _kpi_jours(c, [id_sel])
+        c.execute("DELETE FROM projets WHERE id=?", (id_sel,))
+        _refresh_kpi_daily(c, jours)
+        c.execute("DELETE FROM notifications WHERE projet_id=?", (id_sel,))
+        c.execute("DELETE FROM projet_events WHERE projet_id=?", (id_sel,))
+    bump_data_version()
+
+def add_event(c, projet_id, actor, kind, payload):
+    """Ajoute une entrée à l'historique d'une demande, dans la transaction de `c`."""
+    add_events(c, [(projet_id, actor, kind, payload)])
+
+def add_events(c, events):
+    """Ajoute des entrées (projet_id, actor, kind, payload) à l'historique."""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
+    c.executemany("""
+        INSERT INTO projet_events (projet_id, timestamp, actor, kind, payload)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(projet_id, timestamp, actor, kind, payload)
+          for projet_id, actor, kind, payload in events])
+
+@timed
+def get_projet_events(projet_id) -> pd.DataFrame:
+    return _get_projet_events_cached(projet_id, get_data_version())
+
+def add_notification(projet_id, user_email, message):
+    add_notifications([(projet_id, user_email, message)])
+
+@timed
+def add_notifications(notifications):
+    """Insère des notifications (projet_id, user_email, message) en un lot."""
+    with transaction() as c:
+        c.executemany("""
+            INSERT INTO notifications (projet_id, user_email, message, statut)
+            VALUES (?, ?, ?, 'NON LU')
+        """, notifications)
+
+@timed
+def get_user_notifications(email, limit=None, before=None):
+    """Notifications de l'utilisateur, des plus récentes aux plus anciennes.
+
+    Pagination par curseur : `before` est le couple (created_at, id) de la
+    dernière notification de la page précédente.
+    """
+    import pandas as pd
+    conn = get_connection()
+    query = """
+        SELECT n.*, p.libelle as projet_libelle
+        FROM notifications n
+        LEFT JOIN projets p ON n.projet_id = p.id
+        WHERE n.user_email = ?
+    """
+    params = [email]
+    if before is not None:
+        query += " AND (n.created_at, n.id) < (?, ?)"
+        params.extend(before)
+    query += " ORDER BY n.created_at DESC, n.id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return pd.read_sql_query(query, conn, params=params)
+
+@timed
+def count_unread_notifications(email):
+    conn = get_connection()
+    return conn.execute(
+        "SELECT COUNT(*) FROM notifications WHERE user_email=? AND statut='NON LU'",
+        (email,)).fetchone()[0]
+
+@timed
+def mark_notifications_read(email):
+    with transaction() as c:
+        c.execute("UPDATE notifications SET statut='LU' WHERE user_email=? AND statut='NON LU'",
+                  (email,))
+
+@timed
+def get_user_demandes(email, validation_status=None, limit=None, offset=0):
+    return load_data(columns=MES_DEMANDES_COLUMNS, limit=limit, offset=offset,
+                     email_demandeur=email, validation_status=validation_status)
+
+@timed
+def get_user_demandes_stats(email):
+    return _get_user_demandes_stats_cached(email, get_data_version())
+
+# ═════════════════════════════════════════════════════════════════════
+# DÉMARRAGE DU PROCESSUS
+# ═════════════════════════════════════════════════════════════════════
+_bootstrap_lock = threading.Lock()
+_ready = threading.Event()
+
+def bootstrap(warm=True):
+    """Une seule fois par processus : vérification du schéma et migrations,
+    puis préchargement des lectures communes (tableau de bord, registre,
+    timeline) dans le cache. Les appels suivants ne coûtent qu'un test."""
+    if _ready.is_set():
+        return
+    with _bootstrap_lock:
+        if _ready.is_set():
+            return
+        init_db()
+        if warm:
+            get_dashboard_counts()
+            count_projets()
+            count_projets(validation_status="VALIDEE")
+            load_data(columns=REGISTRE_COLUMNS, validation_status="VALIDEE")
+            load_data(columns=["id"], validation_status="VALIDEE")
+            count_timeline()
+            get_timeline()
+        _ready.set()
+
+def is_ready():
+    """Vrai une fois bootstrap() terminé dans ce processus."""
+    return _ready.is_set()
+
+# ═════════════════════════════════════════════════════════════════════
+# LIGNE DE COMMANDE
+# ═════════════════════════════════════════════════════════════════════
+# python pilotage_data.py init
+# python pilotage_data.py kpi            (cron de nuit : 0 2 * * *)
+# python pilotage_data.py export csv registre.csv --validation_status VALIDEE
+# python pilotage_data.py import demandes.xlsx --email a.b@om.com
+
+def main(argv=None):
+    import argparse
+    import shutil
+    parser = argparse.ArgumentParser(description="Pilotage BI : opérations sur la base")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init", help="crée / migre la base")
+    commands.add_parser("kpi", help="recalcule les indicateurs journaliers (job de nuit)")
+    p_export = commands.add_parser("export", help="exporte les projets")
+    p_export.add_argument("fmt", choices=["xlsx", "csv", "parquet"])
+    p_export.add_argument("output")
+    p_export.add_argument("--validation_status")
+    p_export.add_argument("--departement")
+    p_import = commands.add_parser("import", help="importe des demandes (xlsx/csv)")
+    p_import.add_argument("input")
+    p_import.add_argument("--email", required=True, help="demandeur par défaut")
+    args = parser.parse_args(argv)
+    
+    init_db()
+    if args.command == "kpi":
+        rebuild_kpi_daily()
+        n = get_connection().execute("SELECT COUNT(*) FROM kpi_daily").fetchone()[0]
+        print(f"Indicateurs journaliers recalculés : {n} ligne(s)")
+    elif args.command == "export":
+        with export_projets(args.fmt, validation_status=args.validation_status,
+                            departement=args.departement) as src, \
+             open(args.output, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        print(f"Export écrit dans {args.output}")
+    elif args.command == "import":
+        import pandas as pd
+        if args.input.lower().endswith(".csv"):
+            df = pd.read_csv(args.input, sep=None, engine="python", dtype=str,
+                             encoding="utf-8-sig")
+        else:
+            df = pd.read_excel(args.input, dtype=str)
+        n, rejetees = import_projets(df, args.email)
+        print(f"{n} demande(s) importée(s), {len(rejetees)} ligne(s) rejetée(s)")
+        for _, row in rejetees.iterrows():
+            print(f"  ligne {row.name + 2}: {row['erreurs']}")
+
+if __name__ == "__main__":
+    main()